@@ -35,7 +35,8 @@ class ConversationAgent(AbstractManagedAgent):
             settings.chat_database,
             settings.document_database,
             settings.tools,
-            settings.retrival_document_detection_threshold
+            settings.retrival_document_detection_threshold,
+            settings.tool_route_threshold
         )
         self.workflow = self._create_workflow()
     
@@ -186,9 +187,9 @@ class ConversationAgent(AbstractManagedAgent):
         """获取会话信息"""
         return self.nodes.memory_manager.get_session_info(session_id)
     
-    def list_sessions(self) -> list:
-        """列出所有会话"""
-        return self.nodes.db.get_all_sessions()
+    def list_sessions(self, limit: int = None, offset: int = 0) -> list:
+        """列出会话，可通过limit/offset分页"""
+        return self.nodes.db.get_all_sessions(limit=limit, offset=offset)
     
     def delete_session(self, session_id: str) -> bool:
         """删除会话"""
@@ -15,6 +15,7 @@ from contextlib import asynccontextmanager
 
 from src.agent.conversation_agent import conversation_agent
 from src.api.streaming_handler import StreamingHandler
+from src.tools.subclass.http_client import aclose_async_client
 
 
 class ChatRequest(BaseModel):
@@ -43,6 +44,8 @@ async def lifespan(app: FastAPI):
     print("🚀 启动 Yomi Chatbot API 服务...")
     yield
     print("🛑 关闭 Yomi Chatbot API 服务...")
+    # 关闭搜索工具共享的AsyncClient，释放连接池中的连接
+    await aclose_async_client()
 
 
 # 创建FastAPI应用
@@ -190,10 +193,10 @@ async def run_agent_async(session_id: str, user_input: str) -> str:
 
 
 @app.get("/chat/sessions")
-async def list_sessions():
-    """获取所有会话列表"""
+async def list_sessions(limit: Optional[int] = None, offset: int = 0):
+    """获取会话列表，可通过limit/offset分页"""
     try:
-        sessions = conversation_agent.list_sessions()
+        sessions = conversation_agent.list_sessions(limit=limit, offset=offset)
         return {"sessions": sessions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,9 +4,20 @@ Prompt模板管理工具
 """
 
 import yaml
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict
-from jinja2 import StrictUndefined, Template
+from jinja2 import Environment, StrictUndefined
+
+# 文档内容在prompt中保留的最大字符数
+MAX_DOCUMENT_CONTENT_CHARS = 500
+
+
+def truncate_content(content: str, max_chars: int = MAX_DOCUMENT_CONTENT_CHARS) -> str:
+    """截断过长的内容并追加省略号，未超长时直接返回原字符串，不产生拷贝"""
+    if len(content) <= max_chars:
+        return content
+    return content[:max_chars] + "..."
 
 
 class PromptManager:
@@ -16,6 +27,12 @@ class PromptManager:
         self.RAG_PROMPT_PATH = "src/config/prompts/prompts.yaml"
         self.SUPERVISOR__AGENT_PROMPT_PATH = "src/config/prompts/supervisor_agent_prompts.yaml"
         self._cache_templates = {}
+        # 结构化RAG prompt渲染结果缓存，相同问题和文档不再重复渲染，超出容量时先进先出淘汰
+        self._rag_prompt_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self.rag_prompt_cache_size = 256
+        # 模板渲染环境，注册截断过长文档内容的过滤器
+        self._jinja_env = Environment(undefined=StrictUndefined)
+        self._jinja_env.filters['truncate_content'] = truncate_content
     
     def _load_templates(self, prompt_path: str) -> Any:
         """加载YAML配置文件中的模板"""
@@ -60,7 +77,7 @@ class PromptManager:
             raise ValueError(f"模板 '{template_name}' 不存在")
         
         template_content = templates[template_name]
-        compiled_template = Template(template_content, undefined=StrictUndefined)
+        compiled_template = self._jinja_env.from_string(template_content)
         
         try:
             return compiled_template.render(**variables)
@@ -69,11 +86,25 @@ class PromptManager:
     
     def get_structured_rag_prompt(self, user_question: str, documents: list) -> str:
         """获取结构化RAG prompt"""
+        # 缓存键包含模板中用到的所有文档字段，文档内容更新后不会命中旧结果
+        cache_key = (user_question, tuple(
+            (doc.document_id, doc.title, doc.file_path, round(doc.similarity_score, 3), doc.content)
+            for doc in documents
+        ))
+        cached = self._rag_prompt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         variables = {
             "user_question": user_question,
             "documents": documents
         }
-        return self.populate_template(self.RAG_PROMPT_PATH, "structured_rag_prompt", variables)
+        prompt = self.populate_template(self.RAG_PROMPT_PATH, "structured_rag_prompt", variables)
+        
+        self._rag_prompt_cache[cache_key] = prompt
+        if len(self._rag_prompt_cache) > self.rag_prompt_cache_size:
+            self._rag_prompt_cache.popitem(last=False)
+        return prompt
     
     def get_error_response_prompt(self, error_message: str) -> str:
         """获取错误响应prompt"""
@@ -13,5 +13,7 @@ class SettingsStore:
         self.embedding_model_name = "azure/text-embedding-ada-002"
         self.tools = [add, multiply, human_assistance]
         self.retrival_document_detection_threshold = 0.7
+        # 工具向量路由阈值：输入与所有工具描述的相似度都低于该值时不再调用LLM检测，None表示关闭
+        self.tool_route_threshold = None
 
 default_setting_store = SettingsStore()
\ No newline at end of file
@@ -4,58 +4,84 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+# 聊天数据库的表结构
+CHAT_SCHEMA_SQL = '''
+    -- 会话表
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        user_id TEXT,
+        session_name TEXT
+    );
+    
+    -- 聊天记录表
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        message_type TEXT NOT NULL,  -- 'human', 'ai', 'system', 'tool'
+        content TEXT NOT NULL,
+        tool_name TEXT,  -- 如果是工具调用
+        tool_args TEXT,  -- 工具参数的JSON字符串
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES chat_sessions (session_id)
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_session_id ON chat_messages(session_id);
+    CREATE INDEX IF NOT EXISTS idx_created_at ON chat_messages(created_at);
+'''
+
+# 测试用的快速模式：不做fsync，日志和临时表放在内存中，进程崩溃时可能丢失数据
+FAST_UNSAFE_PRAGMAS = '''
+    PRAGMA journal_mode = MEMORY;
+    PRAGMA synchronous = OFF;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA locking_mode = EXCLUSIVE;
+'''
+
 class ChatDatabase:
-    def __init__(self, db_path: str = "database/chat_history.db"):
+    def __init__(self, db_path: str = "database/chat_history.db", fast_unsafe: bool = False):
         self.db_path = db_path
+        self.fast_unsafe = fast_unsafe  # 仅用于测试，见 FAST_UNSAFE_PRAGMAS
+        # ":memory:" 数据库在连接关闭后即消失，因此需要在实例内保持同一个连接
+        self._memory_conn = self._open() if db_path == ":memory:" else None
         self.init_database()
     
+    def _open(self) -> sqlite3.Connection:
+        """打开新的数据库连接"""
+        conn = sqlite3.connect(self.db_path)
+        if self.fast_unsafe:
+            conn.executescript(FAST_UNSAFE_PRAGMAS)
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """获取数据库连接（内存数据库复用同一连接）"""
+        if self._memory_conn is not None:
+            return self._memory_conn
+        return self._open()
+    
+    def _close(self, conn: sqlite3.Connection):
+        """释放数据库连接（内存数据库的连接保持打开）"""
+        if conn is not self._memory_conn:
+            conn.close()
+    
     def init_database(self):
         """初始化数据库，创建所需的表"""
-        db_dir = Path(self.db_path).parent
-        db_dir.mkdir(parents=True, exist_ok=True)
+        if self._memory_conn is None:
+            db_dir = Path(self.db_path).parent
+            db_dir.mkdir(parents=True, exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn = self._connect()
         
-        # 创建会话表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_sessions (
-                session_id TEXT PRIMARY KEY,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id TEXT,
-                session_name TEXT
-            )
-        ''')
-        
-        # 创建聊天记录表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                message_type TEXT NOT NULL,  -- 'human', 'ai', 'system', 'tool'
-                content TEXT NOT NULL,
-                tool_name TEXT,  -- 如果是工具调用
-                tool_args TEXT,  -- 工具参数的JSON字符串
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (session_id) REFERENCES chat_sessions (session_id)
-            )
-        ''')
-        
-        # 创建索引
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_session_id ON chat_messages(session_id)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_created_at ON chat_messages(created_at)
-        ''')
+        # 一次性执行建表与建索引脚本
+        conn.executescript(CHAT_SCHEMA_SQL)
         
         conn.commit()
-        conn.close()
+        self._close(conn)
     
     def create_session(self, session_id: str, user_id: str = None, session_name: str = None) -> bool:
         """创建新的聊天会话"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -69,23 +95,23 @@ class ChatDatabase:
             print(f"Error creating session: {e}")
             return False
         finally:
-            conn.close()
+            self._close(conn)
     
     def session_exists(self, session_id: str) -> bool:
         """检查会话是否存在"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT 1 FROM chat_sessions WHERE session_id = ?', (session_id,))
         result = cursor.fetchone()
-        conn.close()
+        self._close(conn)
         
         return result is not None
     
     def add_message(self, session_id: str, message_type: str, content: str, 
                    tool_name: str = None, tool_args: dict = None) -> bool:
         """添加聊天消息"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -107,11 +133,11 @@ class ChatDatabase:
             print(f"Error adding message: {e}")
             return False
         finally:
-            conn.close()
+            self._close(conn)
     
     def get_session_history(self, session_id: str, limit: int = None) -> List[Dict[str, Any]]:
         """获取会话历史记录"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         query = '''
@@ -126,7 +152,7 @@ class ChatDatabase:
         
         cursor.execute(query, (session_id,))
         rows = cursor.fetchall()
-        conn.close()
+        self._close(conn)
         
         messages = []
         for row in rows:
@@ -148,30 +174,30 @@ class ChatDatabase:
     
     def get_session_message_count(self, session_id: str) -> int:
         """获取会话消息数量"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM chat_messages WHERE session_id = ?', (session_id,))
         count = cursor.fetchone()[0]
-        conn.close()
+        self._close(conn)
         
         return count
     
     def get_session_text_length(self, session_id: str) -> int:
         """获取会话文本总长度"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT content FROM chat_messages WHERE session_id = ?', (session_id,))
         rows = cursor.fetchall()
-        conn.close()
+        self._close(conn)
         
         total_length = sum(len(row[0]) for row in rows)
         return total_length
     
     def delete_session(self, session_id: str) -> bool:
         """删除会话及其所有消息"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -183,20 +209,22 @@ class ChatDatabase:
             print(f"Error deleting session: {e}")
             return False
         finally:
-            conn.close()
+            self._close(conn)
     
-    def get_all_sessions(self) -> List[Dict[str, Any]]:
-        """获取所有会话"""
-        conn = sqlite3.connect(self.db_path)
+    def get_all_sessions(self, limit: int = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """获取所有会话（支持分页）"""
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # SQLite中LIMIT -1表示不限制数量
         cursor.execute('''
             SELECT session_id, user_id, session_name, created_at, updated_at
             FROM chat_sessions
             ORDER BY updated_at DESC
-        ''')
+            LIMIT ? OFFSET ?
+        ''', (limit if limit is not None else -1, offset))
         rows = cursor.fetchall()
-        conn.close()
+        self._close(conn)
         
         sessions = []
         for row in rows:
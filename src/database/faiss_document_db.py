@@ -7,6 +7,8 @@ from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import uuid
 import os
+import hashlib
+from collections import OrderedDict
 
 try:
     import faiss
@@ -14,16 +16,29 @@ except ImportError:
     print("⚠️ FAISS library not installed. Please install it with: pip install faiss-cpu")
     faiss = None
 
+
+def cosine_to_similarity_score(cosine):
+    """
+    把余弦相似度换算为旧版L2索引的分数 1 / (1 + L2距离平方)
+    
+    归一化向量的L2距离平方等于 2 - 2cos，换算后各处0.7的检索阈值和FTS(0.8)/关键词(0.6)默认分数的相对顺序保持不变
+    """
+    # 裁剪到[-1, 1]：IVF候选不足时的填充值为float32最小值，量化误差也可能略超出范围
+    return 1.0 / (3.0 - 2.0 * np.clip(cosine, -1.0, 1.0))
+
 class FAISSDocumentDatabase:
-    def __init__(self, db_path: str = "database/documents.db", vector_path: str = "database/vectors.index"):
+    def __init__(self, db_path: str = "database/documents.db", vector_path: str = "database/vectors.index",
+                 index_factory: str = "Flat", nprobe: int = 8):
         self.db_path = db_path
         self.vector_path = vector_path
-        self.metadata_path = vector_path.replace('.index', '_metadata.pkl')
         
         # FAISS索引
         self.index = None
         self.dimension = 1536  # Azure OpenAI embedding dimension
-        self.document_ids = []  # 保存文档ID的顺序
+        self.index_factory = index_factory  # faiss.index_factory描述串，如 "Flat"、"IVF100,Flat"
+        self.nprobe = nprobe  # IVF索引搜索时探查的聚类数
+        self.search_cache_size = 256  # 最近查询结果缓存条数
+        self._search_cache: "OrderedDict[Tuple[bytes, int], List[Tuple[str, float]]]" = OrderedDict()
         
         # 定义documents表的有效列（白名单）
         self.valid_columns = {
@@ -33,19 +48,33 @@ class FAISSDocumentDatabase:
             'priority', 'status', 'source', 'author', 'version', 'parent_id',
             'search_keywords', 'summary', 'business_unit', 'access_level',
             'expiry_date', 'custom_field1', 'custom_field2', 'custom_field3',
-            'faiss_index'
+            'faiss_index', 'content_hash'
         }
         
-        if not os.path.exists(self.db_path):
+        if self.db_path != ":memory:" and not os.path.exists(self.db_path):
             print (f"⚠️ 数据库文件 {self.db_path} 不存在，初始化数据库...")
+        # ":memory:" 数据库在连接关闭后即消失，因此需要在实例内保持同一个连接
+        self._memory_conn = sqlite3.connect(self.db_path) if self.db_path == ":memory:" else None
         self.init_database()
         self.init_faiss_index()
 
+    def _connect(self) -> sqlite3.Connection:
+        """获取数据库连接（内存数据库复用同一连接）"""
+        if self._memory_conn is not None:
+            return self._memory_conn
+        return sqlite3.connect(self.db_path)
+
+    def _close(self, conn: sqlite3.Connection):
+        """释放数据库连接（内存数据库的连接保持打开）"""
+        if conn is not self._memory_conn:
+            conn.close()
+
     def init_database(self):
         """初始化SQLite数据库，只存储元数据"""
-        conn = sqlite3.connect(self.db_path)
-        db_dir = Path(self.db_path).parent
-        db_dir.mkdir(parents=True, exist_ok=True)
+        if self._memory_conn is None:
+            db_dir = Path(self.db_path).parent
+            db_dir.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # 创建文档元数据表（不存储embedding）
@@ -85,10 +114,18 @@ class FAISSDocumentDatabase:
                 custom_field2 TEXT,
                 custom_field3 TEXT,
                 -- FAISS索引位置
-                faiss_index INTEGER  -- 在FAISS索引中的位置
+                faiss_index INTEGER,  -- 在FAISS索引中的向量ID
+                -- 内容去重
+                content_hash TEXT  -- 内容的SHA-256哈希
             )
         ''')
         
+        # 兼容旧数据库：补充content_hash列
+        cursor.execute('PRAGMA table_info(documents)')
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        if 'content_hash' not in existing_columns:
+            cursor.execute('ALTER TABLE documents ADD COLUMN content_hash TEXT')
+        
         # 创建文档集合表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS document_collections (
@@ -137,6 +174,7 @@ class FAISSDocumentDatabase:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_search_logs_query ON search_logs(query)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_search_logs_session ON search_logs(session_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_faiss_index ON documents(faiss_index)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)')
         
         # 创建全文搜索索引
         cursor.execute('''
@@ -148,7 +186,7 @@ class FAISSDocumentDatabase:
         ''')
         
         conn.commit()
-        conn.close()
+        self._close(conn)
     
     def init_faiss_index(self):
         """初始化FAISS索引"""
@@ -157,15 +195,16 @@ class FAISSDocumentDatabase:
             return
         
         # 尝试加载现有的FAISS索引
-        if Path(self.vector_path).exists() and Path(self.metadata_path).exists():
+        if Path(self.vector_path).exists():
             try:
-                self.index = faiss.read_index(self.vector_path)
+                index = faiss.read_index(self.vector_path)
                 
-                # 加载元数据
-                with open(self.metadata_path, 'rb') as f:
-                    metadata = pickle.load(f)
-                    self.document_ids = metadata.get('document_ids', [])
-                    self.dimension = metadata.get('dimension', 1536)
+                if isinstance(index, faiss.IndexIDMap2) and index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                    self.index = index
+                    self.dimension = index.d
+                    self._configure_index(self.index)
+                else:
+                    self._migrate_legacy_index(index)
                 
                 print(f"✅ 加载FAISS索引: {self.index.ntotal} 个向量")
                 
@@ -180,19 +219,92 @@ class FAISSDocumentDatabase:
         if faiss is None:
             return
         
-        # 创建FAISS索引 (使用L2距离的平面索引)
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.document_ids = []
+        # 创建FAISS索引 (向量归一化后使用内积，即余弦相似度)
+        self.index = self._build_index()
         
         # 如果数据库中已有文档，重新构建索引
         self._rebuild_index()
     
+    def _build_index(self, training_vectors: np.ndarray = None):
+        """按index_factory创建索引并包装为IndexIDMap2；需要训练的索引在向量不足时退回平面索引"""
+        index = faiss.index_factory(self.dimension, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        
+        if not index.is_trained:
+            if training_vectors is None or len(training_vectors) == 0:
+                # 新建的空库没有训练数据，先使用平面索引，重建索引时再训练
+                index = faiss.IndexFlatIP(self.dimension)
+            else:
+                try:
+                    index.train(training_vectors)
+                except RuntimeError as e:
+                    print(f"⚠️ 训练FAISS索引 {self.index_factory} 失败，使用平面索引: {e}")
+                    index = faiss.IndexFlatIP(self.dimension)
+        
+        # 向量ID直接保存在索引中，搜索结果即为向量ID
+        index = faiss.IndexIDMap2(index)
+        self._configure_index(index)
+        return index
+    
+    def _faiss_id(self, doc_id: str) -> int:
+        """由文档UUID得到稳定的int64向量ID"""
+        return uuid.UUID(doc_id).int & 0x7FFFFFFFFFFFFFFF
+    
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        """复制为float32连续数组并做L2归一化，使内积等于余弦相似度"""
+        vectors = np.array(vectors, dtype='float32', order='C').reshape(-1, self.dimension)
+        faiss.normalize_L2(vectors)
+        return vectors
+    
+    def _migrate_legacy_index(self, legacy_index):
+        """将旧版索引（按位置对应文档、文档ID存于pickle文件、可能使用L2距离）转换为内积的IndexIDMap2索引"""
+        print("🔄 检测到旧版FAISS索引，转换为带向量ID的内积(余弦)索引...")
+        legacy_metadata_path = self.vector_path.replace('.index', '_metadata.pkl')
+        document_ids = []
+        if Path(legacy_metadata_path).exists():
+            with open(legacy_metadata_path, 'rb') as f:
+                document_ids = pickle.load(f).get('document_ids', [])
+        
+        self.dimension = legacy_index.d
+        self._configure_index(legacy_index)
+        count = min(legacy_index.ntotal, len(document_ids))
+        
+        vectors = None
+        if count > 0:
+            vectors = self._normalize(legacy_index.reconstruct_n(0, count))
+        self.index = self._build_index(vectors)
+        
+        faiss_ids = [self._faiss_id(doc_id) for doc_id in document_ids[:count]]
+        if vectors is not None:
+            self.index.add_with_ids(vectors, np.array(faiss_ids, dtype=np.int64))
+        
+        # 数据库中的faiss_index由向量位置改为向量ID
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute('UPDATE documents SET faiss_index = NULL WHERE faiss_index IS NOT NULL')
+        cursor.executemany(
+            'UPDATE documents SET faiss_index = ? WHERE id = ?',
+            list(zip(faiss_ids, document_ids[:count]))
+        )
+        conn.commit()
+        self._close(conn)
+        
+        self._save_index()
+        if Path(legacy_metadata_path).exists():
+            os.remove(legacy_metadata_path)
+    
+    def _configure_index(self, index):
+        """设置IVF索引的搜索参数，并开启direct map以支持重建时取回向量"""
+        ivf_index = faiss.try_extract_index_ivf(index)
+        if ivf_index is not None:
+            ivf_index.nprobe = self.nprobe
+            ivf_index.make_direct_map()
+    
     def _rebuild_index(self):
         """重建FAISS索引"""
         if faiss is None:
             return
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # 获取所有有效文档
@@ -203,7 +315,7 @@ class FAISSDocumentDatabase:
         ''')
         
         documents = cursor.fetchall()
-        conn.close()
+        self._close(conn)
         
         if not documents:
             return
@@ -230,13 +342,32 @@ class FAISSDocumentDatabase:
         
         return valid_params
     
+    def _build_document_params(self, doc_id: str, title: str, content: str, file_path: Optional[str],
+                               faiss_index: Optional[int], extra: Dict[str, Any]) -> Dict[str, Any]:
+        """构建documents表的插入参数"""
+        # 基础字段
+        params = {
+            'id': doc_id,
+            'title': title,
+            'content': content,
+            'file_path': file_path,
+            'word_count': len(content.split()),
+            'char_count': len(content),
+            'updated_at': datetime.now().isoformat(),
+            'faiss_index': faiss_index
+        }
+        
+        # 添加扩展字段（只保留有效的列）
+        params.update(extra)
+        return self._filter_valid_params(params)
+    
     def add_document(self, title: str, content: str, embedding: np.ndarray = None,
                     file_path: str = None, **kwargs) -> str:
         """添加文档"""
         doc_id = str(uuid.uuid4())
         
         # 添加到SQLite数据库
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         faiss_index = None
@@ -251,28 +382,13 @@ class FAISSDocumentDatabase:
                 return doc_id
             
             # 添加到FAISS索引
-            faiss_index = self.index.ntotal
-            self.index.add(embedding.astype('float32'))
-            self.document_ids.append(doc_id)
+            faiss_index = self._faiss_id(doc_id)
+            self.index.add_with_ids(self._normalize(embedding), np.array([faiss_index], dtype=np.int64))
             
             # 保存索引
             self._save_index()
         
-        # 基础字段
-        params = {
-            'id': doc_id,
-            'title': title,
-            'content': content,
-            'file_path': file_path,
-            'word_count': len(content.split()),
-            'char_count': len(content),
-            'updated_at': datetime.now().isoformat(),
-            'faiss_index': faiss_index
-        }
-        
-        # 添加扩展字段（只保留有效的列）
-        params.update(kwargs)
-        params = self._filter_valid_params(params)
+        params = self._build_document_params(doc_id, title, content, file_path, faiss_index, kwargs)
         
         # 构建SQL
         columns = ', '.join(params.keys())
@@ -290,75 +406,202 @@ class FAISSDocumentDatabase:
         ''', (doc_id, title, content, kwargs.get('summary', ''), kwargs.get('search_keywords', '')))
         
         conn.commit()
-        conn.close()
+        self._close(conn)
         
         return doc_id
     
+    def add_documents_bulk(self, documents: List[Dict[str, Any]],
+                           embeddings: np.ndarray = None) -> List[str]:
+        """批量添加文档：向量一次性加入FAISS，元数据在同一个事务中写入
+        
+        Args:
+            documents: 文档字典列表，包含title、content，可选file_path及其他扩展字段
+            embeddings: 与documents一一对应的向量，可以是 (N, D) 矩阵，
+                        也可以是元素可为None的向量列表（None表示该文档没有embedding）
+            
+        Returns:
+            新增文档的ID列表
+        """
+        if not documents:
+            return []
+        
+        doc_ids = [str(uuid.uuid4()) for _ in documents]
+        faiss_ids = [None] * len(documents)
+        
+        matrix = None
+        if embeddings is not None and faiss is not None and self.index is not None:
+            if isinstance(embeddings, np.ndarray):
+                rows = list(range(len(documents)))
+                matrix = embeddings.reshape(len(documents), -1)
+            else:
+                rows = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+                if rows:
+                    matrix = np.stack([np.ravel(embeddings[i]) for i in rows])
+            
+            if matrix is not None:
+                # 确保embedding维度正确
+                if matrix.shape[1] != self.dimension:
+                    print(f"⚠️ Embedding维度不匹配: {matrix.shape[1]} != {self.dimension}")
+                    return []
+                
+                for i in rows:
+                    faiss_ids[i] = self._faiss_id(doc_ids[i])
+        
+        # 按列组合分组，保证未提供的列使用数据库默认值
+        grouped_rows: Dict[Tuple[str, ...], List[list]] = {}
+        fts_rows = []
+        for doc_id, faiss_index, document in zip(doc_ids, faiss_ids, documents):
+            extra = {k: v for k, v in document.items() if k not in ('title', 'content', 'file_path')}
+            params = self._build_document_params(
+                doc_id, document['title'], document['content'],
+                document.get('file_path'), faiss_index, extra
+            )
+            grouped_rows.setdefault(tuple(params.keys()), []).append(list(params.values()))
+            fts_rows.append((doc_id, document['title'], document['content'],
+                             extra.get('summary', ''), extra.get('search_keywords', '')))
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        for columns, rows_values in grouped_rows.items():
+            placeholders = ', '.join(['?' for _ in columns])
+            cursor.executemany(f'''
+                INSERT INTO documents ({', '.join(columns)})
+                VALUES ({placeholders})
+            ''', rows_values)
+        
+        cursor.executemany('''
+            INSERT INTO documents_fts (id, title, content, summary, search_keywords)
+            VALUES (?, ?, ?, ?, ?)
+        ''', fts_rows)
+        
+        conn.commit()
+        self._close(conn)
+        
+        if matrix is not None:
+            # 单次批量添加到FAISS索引
+            self.index.add_with_ids(self._normalize(matrix),
+                                    np.array([faiss_ids[i] for i in rows], dtype=np.int64))
+            self._save_index()
+        
+        return doc_ids
+    
     def _save_index(self):
-        """保存FAISS索引和元数据"""
+        """保存FAISS索引（向量ID保存在索引内，无需额外的元数据文件）"""
+        # 索引内容变化后都会保存，此时缓存的查询结果已失效
+        self._search_cache.clear()
+        
         if faiss is None or self.index is None:
             return
         
         try:
-            # 保存FAISS索引
-            faiss.write_index(self.index, self.vector_path)
-            
-            # 保存元数据
-            metadata = {
-                'document_ids': self.document_ids,
-                'dimension': self.dimension,
-                'created_at': datetime.now().isoformat()
-            }
-            
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(metadata, f)
+            # 先写临时文件再原子替换，避免写入中途崩溃损坏索引
+            tmp_vector_path = f"{self.vector_path}.tmp"
+            faiss.write_index(self.index, tmp_vector_path)
+            os.replace(tmp_vector_path, self.vector_path)
                 
         except Exception as e:
             print(f"⚠️ 保存FAISS索引失败: {e}")
     
     def semantic_search(self, query_embedding: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
         """语义搜索"""
+        return self.semantic_search_batch(query_embedding, top_k)[0]
+    
+    def semantic_search_batch(self, query_embeddings: np.ndarray, top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """批量语义搜索，未命中缓存的查询向量合并为一次FAISS搜索，返回与查询一一对应的结果列表"""
+        query_count = 1 if query_embeddings.ndim == 1 else query_embeddings.shape[0]
         if faiss is None or self.index is None or self.index.ntotal == 0:
-            return []
+            return [[] for _ in range(query_count)]
         
         try:
             # 确保查询向量维度正确
-            if len(query_embedding.shape) == 1:
-                query_embedding = query_embedding.reshape(1, -1)
+            if query_embeddings.shape[-1] != self.dimension:
+                print(f"⚠️ 查询向量维度不匹配: {query_embeddings.shape[-1]} != {self.dimension}")
+                return [[] for _ in range(query_count)]
             
-            if query_embedding.shape[1] != self.dimension:
-                print(f"⚠️ 查询向量维度不匹配: {query_embedding.shape[1]} != {self.dimension}")
-                return []
+            # 一次拷贝完成 (n, d) 变形、float32转换与归一化
+            queries = self._normalize(query_embeddings)
             
-            # 搜索最相似的向量
-            distances, indices = self.index.search(query_embedding.astype('float32'), min(top_k, self.index.ntotal))
+            # 相同查询向量和top_k直接返回缓存结果
+            cache_keys = [(hashlib.blake2b(query.tobytes(), digest_size=16).digest(), top_k) for query in queries]
+            all_results = [None] * query_count
+            missed = []
+            for i, cache_key in enumerate(cache_keys):
+                cached = self._search_cache.get(cache_key)
+                if cached is not None:
+                    self._search_cache.move_to_end(cache_key)
+                    all_results[i] = list(cached)
+                else:
+                    missed.append(i)
             
-            # 转换为相似度分数 (距离越小相似度越高)
-            results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(self.document_ids):
-                    # 将L2距离转换为相似度分数 (0-1)
-                    similarity = 1.0 / (1.0 + distance)
-                    results.append((self.document_ids[idx], similarity))
+            if missed:
+                # 搜索最相似的向量
+                scores, indices = self.index.search(queries[missed], min(top_k, self.index.ntotal))
+                scores = cosine_to_similarity_score(scores)
+                
+                # 通过向量ID查找文档ID（IVF索引在候选不足时会返回-1）
+                doc_id_map = self._lookup_document_ids(list({int(faiss_id) for faiss_id in indices.ravel() if faiss_id >= 0}))
+                
+                for row, i in enumerate(missed):
+                    # 分数已换算为与L2索引时期相同的刻度，阈值和FTS/关键词默认分数的排序不受影响
+                    results = [
+                        (doc_id_map[faiss_id], float(similarity))
+                        for similarity, faiss_id in zip(scores[row], indices[row])
+                        if faiss_id in doc_id_map
+                    ]
+                    self._search_cache[cache_keys[i]] = results
+                    all_results[i] = list(results)
+                
+                while len(self._search_cache) > self.search_cache_size:
+                    self._search_cache.popitem(last=False)
             
-            return results
+            return all_results
             
         except Exception as e:
             print(f"⚠️ 语义搜索失败: {e}")
-            return []
+            return [[] for _ in range(query_count)]
+    
+    def _lookup_document_ids(self, faiss_ids: List[int]) -> Dict[int, str]:
+        """批量将向量ID映射为文档ID"""
+        if not faiss_ids:
+            return {}
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        placeholders = ', '.join(['?' for _ in faiss_ids])
+        cursor.execute(f'SELECT faiss_index, id FROM documents WHERE faiss_index IN ({placeholders})', faiss_ids)
+        rows = cursor.fetchall()
+        self._close(conn)
+        
+        return dict(rows)
+    
+    def search_documents_batch(self, queries: List[str], query_embeddings: np.ndarray = None,
+                               limit: int = 10, search_type: str = 'hybrid') -> List[List[Dict[str, Any]]]:
+        """批量搜索文档，所有查询的语义搜索合并为一次FAISS搜索"""
+        semantic_results = [None] * len(queries)
+        if query_embeddings is not None and search_type in ['semantic', 'hybrid']:
+            semantic_results = self.semantic_search_batch(query_embeddings, limit)
+        
+        return [
+            self.search_documents(query, limit=limit, search_type=search_type, semantic_results=query_results)
+            for query, query_results in zip(queries, semantic_results)
+        ]
     
     def search_documents(self, query: str, query_embedding: np.ndarray = None, 
-                        limit: int = 10, search_type: str = 'hybrid') -> List[Dict[str, Any]]:
-        """搜索文档"""
+                        limit: int = 10, search_type: str = 'hybrid',
+                        semantic_results: List[Tuple[str, float]] = None) -> List[Dict[str, Any]]:
+        """搜索文档，semantic_results为已完成的语义搜索结果时不再重复搜索"""
         results = []
         
         # 1. 语义搜索
-        if query_embedding is not None and search_type in ['semantic', 'hybrid']:
+        if semantic_results is None and query_embedding is not None and search_type in ['semantic', 'hybrid']:
             semantic_results = self.semantic_search(query_embedding, limit)
+        
+        if search_type in ['semantic', 'hybrid']:
             
             if semantic_results:
                 # 获取文档详情
-                conn = sqlite3.connect(self.db_path)
+                conn = self._connect()
                 cursor = conn.cursor()
                 
                 doc_ids = [doc_id for doc_id, _ in semantic_results]
@@ -373,7 +616,7 @@ class FAISSDocumentDatabase:
                 columns = [desc[0] for desc in cursor.description]
                 docs_dict = {row[0]: dict(zip(columns, row)) for row in doc_rows}
                 
-                conn.close()
+                self._close(conn)
                 
                 # 按相似度排序
                 for doc_id, similarity in semantic_results:
@@ -385,7 +628,7 @@ class FAISSDocumentDatabase:
         
         # 2. 全文搜索和关键词搜索
         if search_type in ['fts', 'keyword', 'hybrid']:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._connect()
             cursor = conn.cursor()
             
             # 排除已有结果
@@ -454,7 +697,7 @@ class FAISSDocumentDatabase:
                         result['similarity_score'] = 0.6  # 默认关键词分数
                         results.append(result)
             
-            conn.close()
+            self._close(conn)
         
         # 按相似度排序
         results.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
@@ -463,7 +706,7 @@ class FAISSDocumentDatabase:
     
     def get_document_by_id(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """根据ID获取文档"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM documents WHERE id = ?', (doc_id,))
@@ -472,19 +715,41 @@ class FAISSDocumentDatabase:
         if row:
             columns = [desc[0] for desc in cursor.description]
             result = dict(zip(columns, row))
-            conn.close()
+            self._close(conn)
             return result
         
-        conn.close()
+        self._close(conn)
         return None
     
+    def get_document_ids_by_hash(self, content_hash: str, indexed_only: bool = True) -> List[str]:
+        """
+        根据内容哈希获取有效文档ID
+        
+        Args:
+            content_hash: 文档内容哈希
+            indexed_only: 只返回已写入FAISS索引的文档（embedding失败或重建时被清空的不算）
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        indexed_filter = "AND faiss_index IS NOT NULL" if indexed_only else ""
+        cursor.execute(f'''
+            SELECT id FROM documents
+            WHERE content_hash = ? AND status = 'active' {indexed_filter}
+            ORDER BY chunk_index
+        ''', (content_hash,))
+        rows = cursor.fetchall()
+        
+        self._close(conn)
+        return [row[0] for row in rows]
+    
     def update_document_embedding(self, doc_id: str, embedding: np.ndarray):
         """更新文档的embedding"""
         if faiss is None or self.index is None:
             return False
         
         # 查找文档在FAISS索引中的位置
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT faiss_index FROM documents WHERE id = ?', (doc_id,))
@@ -494,10 +759,9 @@ class FAISSDocumentDatabase:
             faiss_index = row[0]
             
             # 更新FAISS索引中的向量
-            if faiss_index < self.index.ntotal:
-                # FAISS不支持直接更新，需要重建索引
-                # 这里暂时跳过，实际应用中可能需要重建整个索引
-                print("⚠️ FAISS不支持直接更新向量，需要重建索引")
+            # FAISS不支持直接更新，需要重建索引
+            # 这里暂时跳过，实际应用中可能需要重建整个索引
+            print("⚠️ FAISS不支持直接更新向量，需要重建索引")
             
             # 更新数据库时间戳
             cursor.execute('''
@@ -508,12 +772,12 @@ class FAISSDocumentDatabase:
             
             conn.commit()
         
-        conn.close()
+        self._close(conn)
         return True
     
     def delete_document(self, doc_id: str) -> bool:
         """删除文档（软删除）"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -524,7 +788,7 @@ class FAISSDocumentDatabase:
         
         conn.commit()
         affected = cursor.rowcount
-        conn.close()
+        self._close(conn)
         
         # 注意：这里不从FAISS索引中删除，因为FAISS不支持删除
         # 在实际应用中，可能需要定期重建索引来清理已删除的文档
@@ -534,7 +798,7 @@ class FAISSDocumentDatabase:
     def log_search(self, query: str, results_count: int, search_type: str,
                   execution_time: float, session_id: str = None, metadata: str = None):
         """记录搜索日志"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -545,11 +809,11 @@ class FAISSDocumentDatabase:
               execution_time, session_id, metadata))
         
         conn.commit()
-        conn.close()
+        self._close(conn)
     
     def get_document_stats(self) -> Dict[str, Any]:
         """获取文档统计信息"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         stats = {}
@@ -590,26 +854,26 @@ class FAISSDocumentDatabase:
             stats['faiss_vectors'] = 0
             stats['faiss_dimension'] = 0
         
-        conn.close()
+        self._close(conn)
         return stats
     
     def get_collections(self) -> List[Dict[str, Any]]:
         """获取所有文档集合"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM document_collections ORDER BY name')
         results = cursor.fetchall()
         columns = [desc[0] for desc in cursor.description]
         
-        conn.close()
+        self._close(conn)
         return [dict(zip(columns, row)) for row in results]
     
     def create_collection(self, name: str, description: str = None, metadata: str = None) -> str:
         """创建文档集合"""
         collection_id = str(uuid.uuid4())
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -618,13 +882,13 @@ class FAISSDocumentDatabase:
         ''', (collection_id, name, description, metadata))
         
         conn.commit()
-        conn.close()
+        self._close(conn)
         
         return collection_id
     
     def add_document_to_collection(self, document_id: str, collection_id: str):
         """将文档添加到集合"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -633,30 +897,65 @@ class FAISSDocumentDatabase:
         ''', (document_id, collection_id))
         
         conn.commit()
-        conn.close()
+        self._close(conn)
     
     def rebuild_faiss_index(self):
-        """重建FAISS索引"""
+        """重建FAISS索引，清理已删除文档的向量"""
         if faiss is None:
             print("⚠️ FAISS not available")
             return False
         
         print("🔄 开始重建FAISS索引...")
         
-        # 创建新索引
-        new_index = faiss.IndexFlatL2(self.dimension)
-        new_document_ids = []
+        # 一次性取出现有索引中的全部向量及其向量ID（内部索引按添加顺序存放，与id_map一一对应）
+        vectors = None
+        faiss_ids = None
+        if self.index is not None and self.index.ntotal > 0:
+            faiss_ids = faiss.vector_to_array(self.index.id_map)
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
         
-        # 注意：这里需要重新生成所有embeddings
-        # 实际使用时需要调用embedding服务
-        print("⚠️ 需要重新生成所有文档的embeddings")
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*) FROM documents
+            WHERE status = 'active' AND faiss_index IS NOT NULL
+        ''')
+        total = cursor.fetchone()[0]
+        
+        # 预分配数组读取有效文档的向量ID
+        cursor.execute('''
+            SELECT faiss_index FROM documents
+            WHERE status = 'active' AND faiss_index IS NOT NULL
+        ''')
+        active_ids = np.fromiter((row[0] for row in cursor), dtype=np.int64, count=total)
+        
+        # 创建新索引（需要训练时用现有向量训练），单次批量添加保留的向量
+        matrix = None
+        kept_ids = np.empty(0, dtype=np.int64)
+        if faiss_ids is not None:
+            keep = np.isin(faiss_ids, active_ids)
+            matrix = np.ascontiguousarray(vectors[keep], dtype='float32')
+            kept_ids = faiss_ids[keep]
+        new_index = self._build_index(matrix)
+        if len(kept_ids) > 0:
+            new_index.add_with_ids(matrix, kept_ids)
+        
+        # 清除数据库中已不在索引内的向量ID
+        missing_ids = np.setdiff1d(active_ids, kept_ids)
+        cursor.execute("UPDATE documents SET faiss_index = NULL WHERE status != 'active'")
+        cursor.executemany(
+            'UPDATE documents SET faiss_index = NULL WHERE faiss_index = ?',
+            [(int(faiss_id),) for faiss_id in missing_ids]
+        )
+        conn.commit()
+        self._close(conn)
         
         # 更新索引
         self.index = new_index
-        self.document_ids = new_document_ids
         
         # 保存索引
         self._save_index()
         
-        print("✅ FAISS索引重建完成")
+        print(f"✅ FAISS索引重建完成: {new_index.ntotal} 个向量")
         return True
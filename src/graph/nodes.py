@@ -1,3 +1,5 @@
+import json
+import re
 from typing import List, Optional
 from langchain_core.messages import HumanMessage, AIMessage
 from src.database.chat_db import ChatDatabase
@@ -13,13 +15,18 @@ from src.config.prompt_manager import get_prompt_manager
 from src.api.streaming_handler import get_streaming_handler
 from langchain_core.tools import BaseTool
 
+# 清理LLM响应首尾markdown代码块标记的正则，模块加载时编译一次
+_JSON_FENCE_START_RE = re.compile(r'^```json\s*')
+_FENCE_START_RE = re.compile(r'^```\s*')
+_FENCE_END_RE = re.compile(r'\s*```$')
+
 class AgentNodes:
     """Agent工作流节点"""
     
-    def __init__(self, llm: BaseManagedModel, embeddings: BaseManagedEmbedding, chat_db: ChatDatabase, document_db: FAISSDocumentDatabase, tools: Optional[List[BaseTool]], retrival_document_detection_threshold: float = 0.7):
+    def __init__(self, llm: BaseManagedModel, embeddings: BaseManagedEmbedding, chat_db: ChatDatabase, document_db: FAISSDocumentDatabase, tools: Optional[List[BaseTool]], retrival_document_detection_threshold: float = 0.7, tool_route_threshold: Optional[float] = None):
         self.db = chat_db
         self.memory_manager = SmartMemoryManager(llm, chat_db)
-        self.tool_system = ToolConfirmationSystem(llm, tools)
+        self.tool_system = ToolConfirmationSystem(llm, tools, embeddings, tool_route_threshold)
         self.llm = llm
         self.rag_system = RAGSystem(document_db, embeddings)
         self.retrival_document_detection_threshold = retrival_document_detection_threshold
@@ -339,78 +346,60 @@ class AgentNodes:
     
     def _process_structured_response(self, llm_response: str, documents: list) -> str:
         """处理结构化的LLM响应，转换为markdown格式"""
-        import json
-        import re
-        
         try:
             # 尝试解析JSON响应
             # 先清理可能的markdown代码块
             json_content = llm_response.strip()
             if json_content.startswith("```json"):
-                json_content = re.sub(r'^```json\s*', '', json_content)
-                json_content = re.sub(r'\s*```$', '', json_content)
+                json_content = _JSON_FENCE_START_RE.sub('', json_content)
+                json_content = _FENCE_END_RE.sub('', json_content)
             elif json_content.startswith("```"):
-                json_content = re.sub(r'^```\s*', '', json_content)
-                json_content = re.sub(r'\s*```$', '', json_content)
+                json_content = _FENCE_START_RE.sub('', json_content)
+                json_content = _FENCE_END_RE.sub('', json_content)
             
             response_data = json.loads(json_content)
             
-            # 构建markdown响应
-            markdown_response = []
-            
-            # 主要回答
             main_answer = response_data.get("answer_from_llm", "")
-            if main_answer:
-                markdown_response.append(main_answer)
-            
-            # 添加分隔线
-            markdown_response.append("\n---\n")
-            
-            # 添加相关文档信息
             related_doc_ids = response_data.get("related_doc", [])
             doc_answer = response_data.get("answer_from_provided_doc", "")
             
+            # 构建markdown响应，每个逻辑块一次生成
+            sections = [main_answer] if main_answer else []
+            sections.append("\n---\n")
+            
             if related_doc_ids and doc_answer:
-                markdown_response.append("### 📚 基于文档的回答")
-                markdown_response.append(doc_answer)
-                markdown_response.append("")
+                sections.append(f"### 📚 基于文档的回答\n{doc_answer}\n")
             
             if related_doc_ids:
-                markdown_response.append("### 📖 相关文档")
+                sections.append("### 📖 相关文档")
                 
                 # 创建文档ID到文档对象的映射
                 doc_map = {doc.document_id: doc for doc in documents}
-                
-                for doc_id in related_doc_ids:
-                    if doc_id in doc_map:
-                        doc = doc_map[doc_id]
-                        markdown_response.append(f"- **{doc.title}**")
-                        if doc.file_path:
-                            markdown_response.append(f"  - 📁 文件: `{doc.file_path}`")
-                        if hasattr(doc, 'start_line') and doc.start_line > 0:
-                            markdown_response.append(f"  - 📍 位置: 第 {doc.start_line}-{doc.end_line} 行")
-                        markdown_response.append(f"  - 🎯 相似度: {doc.similarity_score:.3f}")
-                        markdown_response.append("")
+                sections.extend(
+                    self._format_related_doc(doc_map[doc_id])
+                    for doc_id in related_doc_ids
+                    if doc_id in doc_map
+                )
             else:
-                markdown_response.append("### ℹ️ 文档信息")
-                markdown_response.append("未找到与问题直接相关的文档，回答主要基于AI的通用知识。")
+                sections.append("### ℹ️ 文档信息\n未找到与问题直接相关的文档，回答主要基于AI的通用知识。")
             
-            return "\n".join(markdown_response)
+            return "\n".join(sections)
             
         except (json.JSONDecodeError, KeyError) as e:
             # 如果JSON解析失败，返回原始响应
             print(f"⚠️ 无法解析结构化响应，返回原始内容: {e}")
             
             # 构建基本的markdown格式
-            markdown_response = [llm_response]
-            markdown_response.append("\n---\n")
-            markdown_response.append("### 📖 相关文档")
-            
+            doc_blocks = []
             for i, doc in enumerate(documents, 1):
-                markdown_response.append(f"{i}. **{doc.title}**")
-                if doc.file_path:
-                    markdown_response.append(f"   - 📁 `{doc.file_path}`")
-                markdown_response.append(f"   - 🎯 相似度: {doc.similarity_score:.3f}")
-                markdown_response.append("")
+                file_line = f"   - 📁 `{doc.file_path}`\n" if doc.file_path else ""
+                doc_blocks.append(f"{i}. **{doc.title}**\n{file_line}   - 🎯 相似度: {doc.similarity_score:.3f}\n")
             
-            return "\n".join(markdown_response)
+            return "\n".join([llm_response, "\n---\n", "### 📖 相关文档", *doc_blocks])
+    
+    def _format_related_doc(self, doc) -> str:
+        """把一个相关文档格式化为markdown列表块"""
+        file_line = f"  - 📁 文件: `{doc.file_path}`\n" if doc.file_path else ""
+        # DocumentSearchResult的start_line总是整数（缺失时为0），直接读取即可
+        line_range = f"  - 📍 位置: 第 {doc.start_line}-{doc.end_line} 行\n" if doc.start_line > 0 else ""
+        return f"- **{doc.title}**\n{file_line}{line_range}  - 🎯 相似度: {doc.similarity_score:.3f}\n"
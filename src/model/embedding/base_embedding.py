@@ -2,6 +2,7 @@
 Embedding模型基类定义，提供统一的Embedding模型接口
 """
 
+import threading
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional, List, Union
 from langchain_core.embeddings import Embeddings
@@ -18,6 +19,7 @@ class BaseManagedEmbedding(ABC):
         self._model_provider = model_provider
         self._embedding_instance: Optional[Embeddings] = None
         self._is_initialized = False
+        self._init_lock = threading.Lock()
     
     @property
     def model_name(self) -> str:
@@ -52,10 +54,30 @@ class BaseManagedEmbedding(ABC):
         懒加载初始化embedding模型
         """
         if self._embedding_instance is None:
-            self._embedding_instance = self._create_embedding()
-            self._is_initialized = True
+            # 加锁保证后台预热和首次调用并发时只创建一次
+            with self._init_lock:
+                if self._embedding_instance is None:
+                    self._embedding_instance = self._create_embedding()
+                    self._is_initialized = True
         return self._embedding_instance
     
+    def prefetch(self) -> threading.Thread:
+        """
+        在后台线程中提前初始化embedding模型，与其他准备工作并行，首次调用时不再阻塞
+        
+        Returns:
+            执行预热的守护线程
+        """
+        def _warmup():
+            try:
+                self._initialize_embedding()
+            except Exception as e:
+                print(f"⚠️ 预热embedding模型 {self.full_name} 失败: {e}")
+        
+        thread = threading.Thread(target=_warmup, name=f"prefetch-{self.full_name}", daemon=True)
+        thread.start()
+        return thread
+    
     @property
     def embedding(self) -> Embeddings:
         """
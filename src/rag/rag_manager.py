@@ -6,11 +6,14 @@ RAG文档管理工具
 """
 
 import argparse
+import os
+import shlex
 import sys
+from contextlib import redirect_stderr, redirect_stdout
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.rag.rag_system import RAGSystem
 from src.database.faiss_document_db import FAISSDocumentDatabase
@@ -193,3 +196,160 @@ class RAGManager:
                     
         except Exception as e:
             print(f"❌ 获取统计信息失败: {e}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行解析器"""
+    parser = argparse.ArgumentParser(description="RAG文档管理工具")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    add_file_parser = subparsers.add_parser('add-file', help='添加单个文件')
+    add_file_parser.add_argument('file_path', help='文件路径')
+    add_file_parser.add_argument('--title', help='文档标题')
+    add_file_parser.add_argument('--category', help='文档分类')
+    add_file_parser.add_argument('--tags', help='文档标签')
+    add_file_parser.add_argument('--author', help='文档作者')
+    
+    add_dir_parser = subparsers.add_parser('add-dir', help='批量添加目录中的文件')
+    add_dir_parser.add_argument('dir_path', help='目录路径')
+    add_dir_parser.add_argument('--pattern', default='*', help='文件匹配模式')
+    add_dir_parser.add_argument('--category', help='文档分类')
+    add_dir_parser.add_argument('--tags', help='文档标签')
+    
+    search_parser = subparsers.add_parser('search', help='搜索文档')
+    search_parser.add_argument('query', help='搜索内容')
+    search_parser.add_argument('--top-k', type=int, default=10, help='返回结果数量')
+    
+    list_parser = subparsers.add_parser('list', help='列出所有文档')
+    list_parser.add_argument('--limit', type=int, default=20, help='最多列出的文档数量')
+    
+    delete_parser = subparsers.add_parser('delete', help='删除文档')
+    delete_parser.add_argument('doc_id', help='文档ID')
+    
+    subparsers.add_parser('stats', help='查看统计信息')
+    
+    repl_parser = subparsers.add_parser('repl', help='常驻进程，逐行执行命令')
+    repl_parser.add_argument('--socket', help='监听的UNIX socket路径')
+    
+    return parser
+
+
+def dispatch(args: argparse.Namespace, manager: RAGManager):
+    """执行单条命令"""
+    if args.command == 'add-file':
+        manager.add_file(args.file_path, title=args.title, category=args.category,
+                         tags=args.tags, author=args.author)
+    elif args.command == 'add-dir':
+        manager.add_directory(args.dir_path, pattern=args.pattern,
+                              category=args.category, tags=args.tags)
+    elif args.command == 'search':
+        manager.search_documents(args.query, top_k=args.top_k)
+    elif args.command == 'list':
+        manager.list_documents(limit=args.limit)
+    elif args.command == 'delete':
+        manager.delete_document(args.doc_id)
+    elif args.command == 'stats':
+        manager.get_stats()
+    elif args.command == 'repl':
+        print("⚠️ 已处于REPL模式")
+
+
+def _run_line(parser: argparse.ArgumentParser, manager: RAGManager, line: str):
+    """解析并执行一行命令"""
+    try:
+        args = parser.parse_args(shlex.split(line))
+    except SystemExit:
+        # argparse在参数错误或--help时会退出，REPL中忽略即可
+        return
+    except ValueError as e:
+        print(f"❌ 命令解析失败: {e}")
+        return
+    
+    if args.command is None:
+        parser.print_help()
+        return
+    
+    dispatch(args, manager)
+
+
+def _serve_socket(parser: argparse.ArgumentParser, manager: RAGManager, socket_path: str):
+    """通过UNIX socket接收命令，输出写回客户端"""
+    import socket
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    print(f"🔌 正在监听 {socket_path} (Ctrl+C 退出)")
+    
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile('r', encoding='utf-8') as reader, \
+                    conn.makefile('w', encoding='utf-8') as writer:
+                for line in reader:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if line in ('quit', 'exit'):
+                        break
+                    with redirect_stdout(writer), redirect_stderr(writer):
+                        _run_line(parser, manager, line)
+                    writer.flush()
+    except KeyboardInterrupt:
+        print("\n🛑 已停止监听")
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def run_repl(parser: argparse.ArgumentParser, manager: RAGManager, socket_path: Optional[str] = None):
+    """常驻模式：索引和embedding模型只加载一次，后续命令复用同一个RAGManager"""
+    if socket_path:
+        _serve_socket(parser, manager, socket_path)
+        return
+    
+    print("💬 RAG管理REPL (输入 'quit' 退出, '-h' 查看帮助)")
+    while True:
+        try:
+            line = input("rag> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        
+        if not line:
+            continue
+        if line in ('quit', 'exit'):
+            break
+        
+        _run_line(parser, manager, line)
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.command is None:
+        parser.print_help()
+        return
+    
+    from src.config.settings_store import default_setting_store
+    from src.global_configuration.embedding_registry import get_embedding
+    
+    manager = RAGManager(
+        default_setting_store.document_database,
+        get_embedding(default_setting_store.embedding_model_name)
+    )
+    
+    if args.command == 'repl':
+        run_repl(parser, manager, args.socket)
+    else:
+        dispatch(args, manager)
+
+
+if __name__ == '__main__':
+    main()
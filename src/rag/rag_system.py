@@ -1,15 +1,26 @@
 import time
+import hashlib
 import numpy as np
 from typing import List, Dict, Any
 from pathlib import Path
 from src.database.faiss_document_db import FAISSDocumentDatabase
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from src.model.embedding import BaseManagedEmbedding
 from src.rag.document_loader import PdfDocumentLoader
 
+# 搜索结果中保留到metadata的字段
+_RESULT_METADATA_KEYS = (
+    'category', 'tags', 'author', 'created_at',
+    'file_type', 'word_count', 'char_count'
+)
 
-@dataclass
+# 提供给LLM的上下文中每个文档内容保留的最大字符数
+MAX_CONTEXT_CONTENT_CHARS = 500
+_CONTEXT_SEPARATOR = "-" * 50
+
+
+@dataclass(slots=True)
 class DocumentSearchResult:
     """文档搜索结果"""
     document_id: str
@@ -21,11 +32,7 @@ class DocumentSearchResult:
     similarity_score: float
     search_type: str
     snippet: str = ""
-    metadata: Dict[str, Any] = None
-    
-    def __post_init__(self):
-        if self.metadata is None:
-            self.metadata = {}
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
 class RAGSystem:
     """检索增强生成系统 - 基于FAISS的版本"""
@@ -66,29 +73,7 @@ class RAGSystem:
         )
         
         # 3. 转换为搜索结果对象
-        search_results = []
-        for result in results[:top_k]:
-            search_result = DocumentSearchResult(
-                document_id=result['id'],
-                title=result['title'],
-                content=result['content'],
-                file_path=result.get('file_path', ''),
-                start_line=result.get('start_line') or 0,
-                end_line=result.get('end_line') or 0,
-                similarity_score=result.get('similarity_score', 0.0),
-                search_type=result.get('search_type', 'hybrid'),
-                snippet=result.get('snippet', ''),
-                metadata={
-                    'category': result.get('category'),
-                    'tags': result.get('tags'),
-                    'author': result.get('author'),
-                    'created_at': result.get('created_at'),
-                    'file_type': result.get('file_type'),
-                    'word_count': result.get('word_count'),
-                    'char_count': result.get('char_count')
-                }
-            )
-            search_results.append(search_result)
+        search_results = self._to_search_results(results, top_k)
         
         # 4. 记录搜索日志
         execution_time = time.time() - start_time
@@ -102,6 +87,64 @@ class RAGSystem:
         
         return search_results
     
+    def search_relevant_documents_batch(self, queries: List[str], top_k: int = 5,
+                                        session_id: str = None) -> List[List[DocumentSearchResult]]:
+        """批量搜索相关文档，所有查询一次生成embedding、一次FAISS搜索"""
+        start_time = time.time()
+        
+        # 1. 批量生成查询的embedding
+        query_embeddings = None
+        try:
+            if self.embeddings and queries:
+                query_embeddings = np.array(self.embeddings.embed_documents(queries))
+        except Exception as e:
+            print(f"⚠️ 批量生成查询embedding失败: {e}")
+        
+        # 2. 使用FAISS进行语义搜索和传统搜索
+        search_type = 'semantic' if query_embeddings is not None else 'hybrid'
+        batch_results = self.document_db.search_documents_batch(
+            queries=queries,
+            query_embeddings=query_embeddings,
+            limit=top_k * 2,
+            search_type=search_type
+        )
+        
+        # 3. 转换为搜索结果对象
+        all_search_results = [self._to_search_results(results, top_k) for results in batch_results]
+        
+        # 4. 记录搜索日志，执行时间按查询数平摊
+        execution_time = (time.time() - start_time) / max(len(queries), 1)
+        for query, search_results in zip(queries, all_search_results):
+            self.document_db.log_search(
+                query=query,
+                results_count=len(search_results),
+                search_type='rag_faiss',
+                execution_time=execution_time,
+                session_id=session_id
+            )
+        
+        return all_search_results
+    
+    def _to_search_results(self, results: List[Dict[str, Any]], top_k: int) -> List[DocumentSearchResult]:
+        """把数据库搜索结果转换为前top_k个搜索结果对象"""
+        count = min(top_k, len(results))
+        search_results = [None] * count
+        for i in range(count):
+            result = results[i]
+            search_results[i] = DocumentSearchResult(
+                document_id=result['id'],
+                title=result['title'],
+                content=result['content'],
+                file_path=result.get('file_path', ''),
+                start_line=result.get('start_line') or 0,
+                end_line=result.get('end_line') or 0,
+                similarity_score=result.get('similarity_score', 0.0),
+                search_type=result.get('search_type', 'hybrid'),
+                snippet=result.get('snippet', ''),
+                metadata={key: result.get(key) for key in _RESULT_METADATA_KEYS}
+            )
+        return search_results
+    
     def add_document(self, title: str, content: str, file_path: str = None, 
                     **metadata) -> str:
         """添加文档到RAG系统"""
@@ -130,19 +173,15 @@ class RAGSystem:
         if not documents:
             return ""
         
-        context_parts = []
-        context_parts.append("=== 相关文档内容 ===")
-        
+        # 每个文档一次生成完整的文本块，避免逐行追加产生大量中间字符串
+        context_parts = ["=== 相关文档内容 ==="]
         for i, doc in enumerate(documents, 1):
-            context_parts.append(f"\n【文档 {i}】")
-            context_parts.append(f"标题: {doc.title}")
-            if doc.file_path:
-                context_parts.append(f"文件: {doc.file_path}")
-            if doc.start_line is not None and doc.start_line > 0:
-                context_parts.append(f"位置: 第 {doc.start_line}-{doc.end_line} 行")
-            context_parts.append(f"内容: {doc.content[:500]}...")  # 限制长度
-            context_parts.append(f"相似度: {doc.similarity_score:.2f}")
-            context_parts.append("-" * 50)
+            file_line = f"文件: {doc.file_path}\n" if doc.file_path else ""
+            line_range = f"位置: 第 {doc.start_line}-{doc.end_line} 行\n" if doc.start_line is not None and doc.start_line > 0 else ""
+            context_parts.append(
+                f"\n【文档 {i}】\n标题: {doc.title}\n{file_line}{line_range}"
+                f"内容: {doc.content[:MAX_CONTEXT_CONTENT_CHARS]}...\n相似度: {doc.similarity_score:.2f}\n{_CONTEXT_SEPARATOR}"
+            )
         
         context_parts.append("=== 请基于以上文档内容回答用户问题 ===")
         
@@ -193,35 +232,64 @@ class RAGSystem:
         # 处理其他文件类型（保持原有逻辑）
         return self._add_regular_document(path, **metadata)
     
+    def _find_duplicate(self, content_hash: str, path: Path, metadata: Dict[str, Any]) -> List[str]:
+        """
+        查找内容相同且已写入向量索引的已有文档，避免重复生成embedding
+        
+        已有文档中有缺少向量的（embedding失败或重建索引时被清空），作废这些旧记录并返回空列表，
+        由调用方重新导入，使文档重新进入向量索引
+        """
+        doc_ids = self.document_db.get_document_ids_by_hash(content_hash, indexed_only=False)
+        if not doc_ids:
+            return []
+        
+        if len(self.document_db.get_document_ids_by_hash(content_hash)) < len(doc_ids):
+            print(f"🔄 文档 {path} 已存在但缺少向量，重新导入")
+            for doc_id in doc_ids:
+                self.document_db.delete_document(doc_id)
+            return []
+        
+        print(f"ℹ️ 文档 {path} 内容已存在，跳过导入")
+        if metadata:
+            print(f"⚠️ 已存在的文档不会更新元数据，忽略: {list(metadata.keys())}")
+        return doc_ids
+    
     def _add_pdf_document(self, path: Path, **metadata) -> List[str]:
         """添加PDF文档（分块处理）"""
+        content_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+        duplicate_ids = self._find_duplicate(content_hash, path, metadata)
+        if duplicate_ids:
+            return duplicate_ids
+        
         try:
             # 使用PDF文档加载器（包含embedding生成）
             document_chunks = self.pdf_document_loader.load_documents(path)
             
-            doc_ids = []
+            documents = []
             for chunk in document_chunks:
                 # 合并元数据
                 combined_metadata = metadata.copy()
                 combined_metadata.update(chunk.metadata)
+                combined_metadata['content_hash'] = content_hash
                 
                 # 创建文档标题
                 chunk_title = f"{combined_metadata.get('title', path.stem)} - 第{combined_metadata.get('page_number', 1)}页"
                 if combined_metadata.get('chunk_index', 0) > 0:
                     chunk_title += f" - 片段{combined_metadata.get('chunk_index', 0) + 1}"
                 
-                # 从combined_metadata中移除title，避免参数冲突
-                combined_metadata.pop('title', None)
-                
-                # 直接使用chunk中的embedding添加到数据库
-                doc_id = self.document_db.add_document(
-                    title=chunk_title,
-                    content=chunk.content,
-                    embedding=chunk.embedding,
-                    file_path=str(path),
-                    **combined_metadata
-                )
-                doc_ids.append(doc_id)
+                # 覆盖metadata中的title，避免参数冲突
+                combined_metadata.update({
+                    'title': chunk_title,
+                    'content': chunk.content,
+                    'file_path': str(path)
+                })
+                documents.append(combined_metadata)
+            
+            # 直接使用chunk中的embedding，一次性批量添加到数据库
+            doc_ids = self.document_db.add_documents_bulk(
+                documents,
+                embeddings=[chunk.embedding for chunk in document_chunks]
+            )
             
             print(f"✅ 成功添加PDF文档 {path}: {len(doc_ids)} 个文档块")
             return doc_ids
@@ -241,6 +309,17 @@ class RAGSystem:
             with open(path, 'r', encoding='gbk') as f:
                 content = f.read()
         
+        # 空文件或重复内容无需生成embedding
+        if not content.strip():
+            print(f"ℹ️ 文档 {path} 内容为空，跳过导入")
+            return []
+        
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        duplicate_ids = self._find_duplicate(content_hash, path, metadata)
+        if duplicate_ids:
+            return duplicate_ids
+        metadata['content_hash'] = content_hash
+        
         # 提取文件信息
         title = metadata.get('title', path.stem)
         file_type = path.suffix.lower()
@@ -4,6 +4,7 @@ LangGraph Agent 示例运行文件
 """
 
 from src.agent.conversation_agent import create_agent
+import sys
 import uuid
 
 def main():
@@ -74,9 +75,9 @@ def show_all_sessions(agent):
     """显示所有会话"""
     sessions = agent.list_sessions()
     if sessions:
-        print(f"\n📋 所有会话 ({len(sessions)} 个):")
-        for session in sessions:
-            print(f"   • {session['session_id']} - {session['updated_at']}")
+        lines = [f"\n📋 所有会话 ({len(sessions)} 个):"]
+        lines.extend(f"   • {session['session_id']} - {session['updated_at']}" for session in sessions)
+        sys.stdout.write("\n".join(lines) + "\n")
     else:
         print("\n📋 暂无会话记录")
 
@@ -110,8 +111,6 @@ def demo_conversation():
     print("\n✅ 演示对话完成")
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         demo_conversation()
     else:
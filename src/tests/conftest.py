@@ -0,0 +1,73 @@
+"""
+pytest 共享夹具
+"""
+
+import os
+import socket
+import pytest
+from pathlib import Path
+from src.database.chat_db import ChatDatabase
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# pytest-xdist 已经按CPU核数开启多个进程，每个进程内的FAISS只用单线程，避免OpenMP线程争抢
+if faiss is not None and os.getenv("PYTEST_XDIST_WORKER"):
+    faiss.omp_set_num_threads(1)
+
+# 已提交的测试PDF，由 fixtures/generate_pdfs.py 生成
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+
+class _BlockedSocket(socket.socket):
+    """禁止建立网络连接的socket，本地UNIX socket不受影响"""
+    
+    def connect(self, address):
+        if self.family in (socket.AF_INET, socket.AF_INET6):
+            raise OSError(f"测试中禁止访问网络: {address}，需要联网的测试请标记 @pytest.mark.network")
+        return super().connect(address)
+
+
+@pytest.fixture(autouse=True)
+def _no_net(request, monkeypatch):
+    """未标记network的测试禁止联网，离线运行时直接失败而不是等待TCP连接超时"""
+    if request.node.get_closest_marker("network") is None:
+        monkeypatch.setattr(socket, "socket", _BlockedSocket)
+
+
+@pytest.fixture(scope="session")
+def shared_db():
+    """整个测试会话共用一个内存数据库，避免每个测试重复建连接和建表"""
+    return ChatDatabase(":memory:", fast_unsafe=True)
+
+
+@pytest.fixture
+def chat_db(shared_db):
+    """提供共享数据库，并在测试结束后清空数据以隔离各个测试"""
+    yield shared_db
+    # ChatDatabase 的方法内部会自行 commit，无法用 BEGIN/ROLLBACK 回滚，这里直接清表
+    shared_db._connect().executescript('DELETE FROM chat_messages; DELETE FROM chat_sessions;')
+
+
+@pytest.fixture(scope="session")
+def basic_test_pdf():
+    """已提交的基本测试PDF"""
+    return str(FIXTURE_DIR / "basic_zh.pdf")
+
+
+@pytest.fixture(scope="session")
+def long_test_pdf():
+    """已提交的较长测试PDF"""
+    return str(FIXTURE_DIR / "long_zh.pdf")
+
+
+@pytest.fixture(scope="session")
+def pdf_warmup(basic_test_pdf):
+    """预热PDF解析与文本分割路径，把首次加载的延迟导入和初始化开销挪到计时测试之外"""
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    pages = PyPDFLoader(basic_test_pdf).load()
+    RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=50).split_text(pages[0].page_content)
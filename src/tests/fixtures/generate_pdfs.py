@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+生成PdfDocumentLoader测试使用的固定PDF文件
+
+测试直接读取本目录下已提交的PDF，修改内容后手动运行一次并提交生成结果：
+    python -m src.tests.fixtures.generate_pdfs
+"""
+
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).parent
+
+# 基本测试PDF内容
+BASIC_PDF_CONTENT = """
+这是一个测试PDF文档。
+
+第一章：介绍
+这是一个关于Python编程的测试文档。Python是一种高级编程语言，具有简洁的语法和强大的功能。
+
+第二章：基础语法
+变量定义：
+name = "测试"
+age = 25
+
+函数定义：
+def hello_world():
+    print("Hello, World!")
+
+第三章：数据结构
+列表：[1, 2, 3, 4, 5]
+字典：{"key": "value", "name": "测试"}
+
+这是一个较长的段落，用于测试文档分块功能。我们需要确保PDF加载器能够正确地将长文档分割成合适的块，同时保持内容的完整性和可读性。每个块都应该有适当的元数据，包括页码、块索引等信息。
+"""
+
+# 性能测试用的长文本内容（20个段落）
+LONG_PDF_CONTENT = "\n\n".join([
+    f"这是第{i}段内容。" + "测试内容 " * 50 + f"段落{i}结束。"
+    for i in range(1, 21)
+])
+
+
+def create_test_pdf(content: str, file_path: str):
+    """创建简单的测试PDF文件"""
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+        # 使用reportlab内置的中文CID字体，不依赖系统字体且生成的文件很小
+        font_name = 'STSong-Light'
+        pdfmetrics.registerFont(UnicodeCIDFont(font_name))
+
+        # 创建PDF文档
+        doc = SimpleDocTemplate(file_path, pagesize=letter)
+        styles = getSampleStyleSheet()
+
+        # 创建支持中文的段落样式
+        chinese_style = ParagraphStyle(
+            'Chinese',
+            parent=styles['Normal'],
+            fontName=font_name,
+            fontSize=12,
+            leading=16,
+            encoding='utf-8'
+        )
+
+        story = []
+
+        # 分段添加内容
+        paragraphs = content.split('\n\n')
+        for paragraph in paragraphs:
+            if paragraph.strip():
+                # 清理段落内容
+                clean_text = paragraph.strip()
+                # 替换可能导致问题的字符
+                clean_text = clean_text.replace('\r\n', ' ').replace('\r', ' ').replace('\n', ' ')
+
+                try:
+                    story.append(Paragraph(clean_text, chinese_style))
+                    story.append(Spacer(1, 12))
+                except Exception as e:
+                    print(f"⚠️ 段落处理失败: {e}")
+                    # 降级处理：只使用ASCII字符
+                    ascii_text = clean_text.encode('ascii', 'ignore').decode('ascii')
+                    if ascii_text.strip():
+                        story.append(Paragraph(ascii_text, styles['Normal']))
+                        story.append(Spacer(1, 12))
+
+        # 如果没有内容，添加一个默认段落
+        if not story:
+            story.append(Paragraph("Test PDF Document", styles['Normal']))
+
+        doc.build(story)
+        return True
+
+    except ImportError:
+        print("⚠️ 需要安装reportlab库: pip install reportlab")
+        return False
+    except Exception as e:
+        print(f"⚠️ 创建PDF失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """生成全部测试PDF"""
+    for file_name, content in [("basic_zh.pdf", BASIC_PDF_CONTENT), ("long_zh.pdf", LONG_PDF_CONTENT)]:
+        file_path = FIXTURE_DIR / file_name
+        if create_test_pdf(content, str(file_path)):
+            print(f"✅ 已生成: {file_path}")
+
+
+if __name__ == "__main__":
+    main()
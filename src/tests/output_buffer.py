@@ -0,0 +1,22 @@
+"""
+测试输出缓冲工具
+"""
+
+import contextlib
+import functools
+import io
+import sys
+
+
+def buffered_output(func):
+    """把测试函数内的print输出先写入内存缓冲区，函数结束（包括抛出异常）时一次性写到stdout"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        buffer = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(buffer):
+                return func(*args, **kwargs)
+        finally:
+            sys.stdout.write(buffer.getvalue())
+            sys.stdout.flush()
+    return wrapper
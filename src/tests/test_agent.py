@@ -4,6 +4,7 @@ LangGraph Agent 测试文件
 
 import tempfile
 import os
+import pytest
 from src.database.chat_db import ChatDatabase
 from src.memory.smart_memory_manager import SmartMemoryManager
 from src.tools.tool_manager import ToolMatcher
@@ -12,16 +13,10 @@ from src.agent.conversation_agent import ConversationAgent
 class TestChatDatabase:
     """测试数据库功能"""
     
-    def setup_method(self):
-        """设置测试环境"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.temp_dir, "test_chat.db")
-        self.db = ChatDatabase(self.db_path)
-    
-    def teardown_method(self):
-        """清理测试环境"""
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
+    @pytest.fixture(autouse=True)
+    def _setup(self, chat_db):
+        """设置测试环境（复用会话级共享的内存数据库）"""
+        self.db = chat_db
     
     def test_create_session(self):
         """测试创建会话"""
@@ -95,18 +90,12 @@ class TestToolMatcher:
 class TestSmartMemoryManager:
     """测试智能记忆管理器"""
     
-    def setup_method(self):
-        """设置测试环境"""
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.temp_dir, "test_memory.db")
-        self.db = ChatDatabase(self.db_path)
+    @pytest.fixture(autouse=True)
+    def _setup(self, chat_db):
+        """设置测试环境（复用会话级共享的内存数据库）"""
+        self.db = chat_db
         self.memory_manager = SmartMemoryManager(self.db, max_tokens=50)  # 很小的阈值用于测试
     
-    def teardown_method(self):
-        """清理测试环境"""
-        if os.path.exists(self.db_path):
-            os.remove(self.db_path)
-    
     def test_session_initialization(self):
         """测试会话初始化"""
         session_id = "test_memory_001"
@@ -155,7 +144,7 @@ if __name__ == "__main__":
     
     # 测试数据库
     test_db = TestChatDatabase()
-    test_db.setup_method()
+    test_db.db = ChatDatabase(":memory:", fast_unsafe=True)
     
     try:
         test_db.test_create_session()
@@ -165,8 +154,6 @@ if __name__ == "__main__":
         print("✅ 数据库测试通过")
     except Exception as e:
         print(f"❌ 数据库测试失败: {e}")
-    finally:
-        test_db.teardown_method()
     
     # 测试工具匹配
     test_tool = TestToolMatcher()
@@ -180,16 +167,15 @@ if __name__ == "__main__":
     
     # 测试内存管理
     test_memory = TestSmartMemoryManager()
-    test_memory.setup_method()
     
     try:
+        test_memory.db = ChatDatabase(":memory:", fast_unsafe=True)
+        test_memory.memory_manager = SmartMemoryManager(test_memory.db, max_tokens=50)
         test_memory.test_session_initialization()
         test_memory.test_add_messages()
         print("✅ 内存管理测试通过")
     except Exception as e:
         print(f"❌ 内存管理测试失败: {e}")
-    finally:
-        test_memory.teardown_method()
     
     # 集成测试
     try:
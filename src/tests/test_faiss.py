@@ -5,10 +5,12 @@ FAISS RAG系统测试脚本
 
 import sys
 import os
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 
 # 添加项目路径
-sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent.parent))
 try:
     import faiss
     import numpy as np
@@ -17,6 +19,26 @@ try:
 except ImportError:
     FAISS_AVAILABLE = False
 
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from src.model.embedding.base_embedding import BaseManagedEmbedding
+
+EMBEDDING_DIM = 1536  # Azure OpenAI维度
+# 检索相关文档的相似度阈值，与 settings_store 中 retrival_document_detection_threshold 的默认值一致
+RETRIEVAL_THRESHOLD = 0.7
+
+@lru_cache(maxsize=None)
+def random_embeddings() -> "np.ndarray":
+    """固定种子生成一次随机向量池，各测试按需切片复用"""
+    rng = np.random.default_rng(1234)
+    return rng.random((2000, EMBEDDING_DIM), dtype=np.float32)
+
+@lru_cache(maxsize=None)
+def flat_index_64() -> "faiss.Index":
+    """只构建一次的64维平面索引（100个向量），供FAISS冒烟测试共享"""
+    index = faiss.IndexFlatL2(64)
+    index.add(np.ascontiguousarray(random_embeddings()[:100, :64]))
+    return index
+
 def test_faiss_installation():
     """测试FAISS安装"""
     print("🧪 测试FAISS安装...")
@@ -26,30 +48,22 @@ def test_faiss_installation():
         return False
     
     try:
-        # 创建简单的测试索引
-        d = 64  # 向量维度
-        nb = 100  # 数据库大小
-        
-        # 创建随机数据
-        np.random.seed(1234)
-        xb = np.random.random((nb, d)).astype('float32')
-        
-        # 创建索引
-        index = faiss.IndexFlatL2(d)
-        index.add(xb)
-        
-        # 测试搜索
-        xq = np.random.random((5, d)).astype('float32')
+        # 复用共享的测试索引，只执行批量搜索
+        index = flat_index_64()
+        xq = np.ascontiguousarray(random_embeddings()[100:105, :index.d])
         D, I = index.search(xq, 4)
+        assert I.shape == (5, 4), "每个查询应返回4个结果"
         
         print(f"✅ FAISS测试通过，索引大小: {index.ntotal}")
         return True
         
+    except AssertionError:
+        raise
     except Exception as e:
         print(f"❌ FAISS测试失败: {e}")
         return False
 
-def test_faiss_document_db():
+def test_faiss_document_db(tmp_path: Path):
     """测试FAISS文档数据库"""
     print("\n🧪 测试FAISS文档数据库...")
     
@@ -60,8 +74,8 @@ def test_faiss_document_db():
     try:
         from src.database.faiss_document_db import FAISSDocumentDatabase
         
-        # 创建数据库
-        db = FAISSDocumentDatabase("test_faiss.db", "test_vectors.index")
+        # 创建数据库（SQLite使用内存库，仅保留FAISS索引文件）
+        db = FAISSDocumentDatabase(":memory:", str(tmp_path / "vectors.index"))
         
         # 添加测试文档（不带embedding）
         doc_id1 = db.add_document(
@@ -89,12 +103,6 @@ def test_faiss_document_db():
         stats = db.get_document_stats()
         print(f"✅ 文档统计: {stats}")
         
-        # 清理测试文件
-        cleanup_files = ["test_faiss.db", "test_vectors.index", "test_vectors_metadata.pkl"]
-        for file in cleanup_files:
-            if os.path.exists(file):
-                os.remove(file)
-        
         return True
         
     except Exception as e:
@@ -103,7 +111,7 @@ def test_faiss_document_db():
         traceback.print_exc()
         return False
 
-def test_faiss_with_embeddings():
+def test_faiss_with_embeddings(tmp_path: Path):
     """测试FAISS与embedding集成"""
     print("\n🧪 测试FAISS与embedding集成...")
     
@@ -114,41 +122,45 @@ def test_faiss_with_embeddings():
     try:
         from src.database.faiss_document_db import FAISSDocumentDatabase
         
-        # 创建数据库
-        db = FAISSDocumentDatabase("test_faiss_embed.db", "test_embed_vectors.index")
+        # 创建数据库（SQLite使用内存库，仅保留FAISS索引文件）
+        db = FAISSDocumentDatabase(":memory:", str(tmp_path / "embed_vectors.index"))
         
         # 创建模拟embedding
-        embedding_dim = 1536  # Azure OpenAI维度
-        
-        # 添加带embedding的文档
-        doc1_embedding = np.random.random((embedding_dim,)).astype('float32')
-        doc2_embedding = np.random.random((embedding_dim,)).astype('float32')
-        
-        doc_id1 = db.add_document(
-            title="向量搜索原理",
-            content="向量搜索是基于向量空间模型的信息检索技术。",
-            embedding=doc1_embedding,
-            category="technology"
-        )
-        
-        doc_id2 = db.add_document(
-            title="FAISS使用指南",
-            content="FAISS是Facebook开发的高效向量搜索库。",
-            embedding=doc2_embedding,
-            category="technology"
-        )
+        vectors = random_embeddings()
+        
+        # 批量添加带embedding的文档
+        doc_embeddings = vectors[:2]
+        
+        doc_id1, doc_id2 = db.add_documents_bulk([
+            {
+                "title": "向量搜索原理",
+                "content": "向量搜索是基于向量空间模型的信息检索技术。",
+                "category": "technology"
+            },
+            {
+                "title": "FAISS使用指南",
+                "content": "FAISS是Facebook开发的高效向量搜索库。",
+                "category": "technology"
+            }
+        ], embeddings=doc_embeddings)
         
         print(f"✅ 添加带embedding的文档1: {doc_id1[:8]}...")
         print(f"✅ 添加带embedding的文档2: {doc_id2[:8]}...")
         
         # 测试语义搜索
-        query_embedding = np.random.random((embedding_dim,)).astype('float32')
+        # (1, d) 的连续float32切片视图，可直接作为FAISS查询，无需额外分配
+        query_embedding = vectors[2:3]
+        assert query_embedding.flags['C_CONTIGUOUS'] and query_embedding.dtype == np.float32
         semantic_results = db.semantic_search(query_embedding, top_k=5)
         print(f"✅ 语义搜索结果: {len(semantic_results)} 个")
         
         for doc_id, similarity in semantic_results:
             print(f"   - {doc_id[:8]}... (相似度: {similarity:.4f})")
         
+        # 重复查询命中缓存，结果一致
+        assert db.semantic_search(query_embedding, top_k=5) == semantic_results, "缓存结果应与首次搜索一致"
+        assert len(db._search_cache) == 1, "相同查询只应缓存一条结果"
+        
         # 测试混合搜索
         results = db.search_documents(
             "向量搜索",
@@ -162,68 +174,173 @@ def test_faiss_with_embeddings():
         stats = db.get_document_stats()
         print(f"✅ FAISS统计: {stats.get('faiss_vectors', 0)} 个向量")
         
-        # 清理测试文件
-        cleanup_files = ["test_faiss_embed.db", "test_embed_vectors.index", "test_embed_vectors_metadata.pkl"]
-        for file in cleanup_files:
-            if os.path.exists(file):
-                os.remove(file)
+        # 测试IVF索引：空库先使用平面索引，重建时用已有向量训练IVF
+        ivf_db = FAISSDocumentDatabase(":memory:", str(tmp_path / "ivf_vectors.index"),
+                                       index_factory="IVF4,Flat", nprobe=2)
+        ivf_db.add_documents_bulk(
+            [{"title": f"IVF测试文档{i}", "content": f"用于测试IVF索引的文档{i}"} for i in range(64)],
+            embeddings=vectors[3:67]
+        )
+        ivf_db.rebuild_faiss_index()
+        assert faiss.try_extract_index_ivf(ivf_db.index) is not None, "重建后应该使用IVF索引"
+        
+        ivf_results = ivf_db.semantic_search(query_embedding, top_k=5)
+        print(f"✅ IVF语义搜索结果: {len(ivf_results)} 个")
         
         return True
         
+    except AssertionError:
+        # 断言失败（缓存、IVF、查询向量布局）必须让pytest看到，不能被下面的兜底吞掉
+        raise
     except Exception as e:
         print(f"❌ FAISS embedding测试失败: {e}")
         import traceback
         traceback.print_exc()
         return False
 
-def test_rag_system():
+def unit_vector_with_cosine(cosine: float) -> "np.ndarray":
+    """构造与第一个坐标轴单位向量余弦相似度为cosine的单位向量"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    vector[0] = cosine
+    vector[1] = np.sqrt(1.0 - cosine ** 2)
+    return vector
+
+def test_similarity_threshold_rejects_unrelated(tmp_path: Path):
+    """语义搜索分数与0.7阈值的刻度一致：无关文档被过滤，相关文档保留"""
+    print("\n🧪 测试语义搜索分数与检索阈值...")
+    
+    if not FAISS_AVAILABLE:
+        print("❌ FAISS未安装，跳过测试")
+        return False
+    
+    from src.database.faiss_document_db import FAISSDocumentDatabase
+    
+    db = FAISSDocumentDatabase(":memory:", str(tmp_path / "threshold_vectors.index"))
+    # ada-002中互不相关文档的余弦相似度中位数约为0.72，相关文档通常在0.9以上
+    unrelated_id, related_id = db.add_documents_bulk([
+        {"title": "无关文档", "content": "与查询无关的内容"},
+        {"title": "相关文档", "content": "与查询相关的内容"}
+    ], embeddings=np.stack([unit_vector_with_cosine(0.724), unit_vector_with_cosine(0.95)]))
+    
+    scores = dict(db.semantic_search(unit_vector_with_cosine(1.0)[None, :], top_k=2))
+    print(f"✅ 无关文档分数: {scores[unrelated_id]:.3f}，相关文档分数: {scores[related_id]:.3f}")
+    assert scores[unrelated_id] < RETRIEVAL_THRESHOLD, "无关文档不应通过检索阈值"
+    assert scores[related_id] > RETRIEVAL_THRESHOLD, "相关文档应该通过检索阈值"
+    
+    return True
+
+def test_fp16_scalar_quantizer_recall():
+    """测试fp16标量量化索引：向量内存减半，召回率与精确余弦索引对比"""
+    print("\n🧪 测试fp16标量量化召回率...")
+    
+    if not FAISS_AVAILABLE:
+        print("❌ FAISS未安装，跳过测试")
+        return False
+    
+    # 不包在try中，召回率下降时断言失败会直接报告给pytest
+    vectors = random_embeddings()
+    xb = vectors[1000:2000].copy()
+    xq = vectors[:10].copy()
+    faiss.normalize_L2(xb)
+    faiss.normalize_L2(xq)
+    
+    oracle_index = faiss.IndexFlatIP(EMBEDDING_DIM)
+    oracle_index.add(xb)
+    sq_index = faiss.IndexScalarQuantizer(EMBEDDING_DIM, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    sq_index.add(xb)
+    
+    _, expected = oracle_index.search(xq, 10)
+    _, actual = sq_index.search(xq, 10)
+    recall = np.mean([len(set(e) & set(a)) / 10 for e, a in zip(expected, actual)])
+    print(f"✅ fp16标量量化召回率: {recall:.2f}")
+    assert recall >= 0.95, "fp16量化后召回率应该不低于0.95"
+    
+    return True
+
+class FakeEmbedding(BaseManagedEmbedding):
+    """按文本哈希生成固定向量的embedding，测试时无需调用真实的embedding服务"""
+
+    def __init__(self, dimension: int = EMBEDDING_DIM):
+        super().__init__("fake-embedding", "test")
+        self.dimension = dimension
+
+    def _create_embedding(self) -> Embeddings:
+        return DeterministicFakeEmbedding(size=self.dimension)
+
+def test_rag_system(tmp_path: Path):
     """测试RAG系统"""
     print("\n🧪 测试RAG系统...")
     
-    try:
-        from src.rag.rag_system import RAGSystem
-        
-        # 创建RAG系统
-        rag = RAGSystem()
-        
-        # 添加测试文档
-        doc_id = rag.add_document(
-            title="测试文档",
-            content="这是一个用于测试RAG系统的示例文档。",
-            category="test"
-        )
-        
-        print(f"✅ RAG系统添加文档: {doc_id[:8]}...")
-        
-        # 测试搜索
-        results = rag.search_relevant_documents("测试", top_k=3)
-        print(f"✅ RAG搜索结果: {len(results)} 个")
-        
-        # 测试上下文格式化
-        if results:
-            context = rag.format_context_for_llm(results)
-            print(f"✅ 生成上下文长度: {len(context)} 字符")
-            
-            references = rag.format_source_references(results)
-            print(f"✅ 生成引用长度: {len(references)} 字符")
-        
-        # 获取统计
-        stats = rag.get_document_stats()
-        print(f"✅ RAG统计: {stats}")
-        
-        # 清理测试文件
-        cleanup_files = ["documents.db", "vectors.index", "vectors_metadata.pkl"]
-        for file in cleanup_files:
-            if os.path.exists(file):
-                os.remove(file)
-        
-        return True
+    if not FAISS_AVAILABLE:
+        print("❌ FAISS未安装，跳过测试")
+        return False
+    
+    from src.database.faiss_document_db import FAISSDocumentDatabase
+    from src.rag.rag_system import RAGSystem
+    
+    # 创建RAG系统（数据库和索引文件都放在tmp_path中，不写入当前目录或database/）
+    document_db = FAISSDocumentDatabase(str(tmp_path / "rag_documents.db"), str(tmp_path / "rag_vectors.index"))
+    rag = RAGSystem(document_db, FakeEmbedding())
+    
+    # 添加测试文档
+    doc_id = rag.add_document(
+        title="测试文档",
+        content="这是一个用于测试RAG系统的示例文档。",
+        category="test"
+    )
+    
+    print(f"✅ RAG系统添加文档: {doc_id[:8]}...")
+    assert document_db.get_document_stats().get('faiss_vectors') == 1, "文档应该写入向量索引"
+    
+    # 测试搜索
+    results = rag.search_relevant_documents("测试", top_k=3)
+    print(f"✅ RAG搜索结果: {len(results)} 个")
+    assert doc_id in [result.document_id for result in results], "应该检索到刚添加的文档"
+    
+    # 测试上下文格式化
+    if results:
+        context = rag.format_context_for_llm(results)
+        print(f"✅ 生成上下文长度: {len(context)} 字符")
         
-    except Exception as e:
-        print(f"❌ RAG系统测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        references = rag.format_source_references(results)
+        print(f"✅ 生成引用长度: {len(references)} 字符")
+    
+    # 获取统计
+    stats = rag.get_document_stats()
+    print(f"✅ RAG统计: {stats}")
+    
+    return True
+
+def test_duplicate_file_reindexes_missing_vectors(tmp_path: Path):
+    """内容相同但缺少向量的已有文档不算重复，重新导入后进入向量索引；已有向量时跳过导入"""
+    print("\n🧪 测试重复文件导入与向量修复...")
+    
+    if not FAISS_AVAILABLE:
+        print("❌ FAISS未安装，跳过测试")
         return False
+    
+    from src.database.faiss_document_db import FAISSDocumentDatabase
+    from src.rag.rag_system import RAGSystem
+    
+    document_db = FAISSDocumentDatabase(str(tmp_path / "dup_documents.db"), str(tmp_path / "dup_vectors.index"))
+    text_file = tmp_path / "notes.txt"
+    text_file.write_text("向量索引修复测试文档", encoding="utf-8")
+    
+    # 没有embedding时导入，文档只进入SQLite，不在向量索引中
+    unindexed_ids = RAGSystem(document_db, None).add_document_from_file(str(text_file))
+    assert document_db.index.ntotal == 0, "没有embedding时不应写入向量"
+    
+    rag = RAGSystem(document_db, FakeEmbedding())
+    reindexed_ids = rag.add_document_from_file(str(text_file))
+    assert reindexed_ids != unindexed_ids, "缺少向量的已有文档应该重新导入"
+    assert document_db.index.ntotal == 1, "重新导入后文档应该进入向量索引"
+    assert document_db.get_document_by_id(unindexed_ids[0])['status'] == 'deleted', "缺少向量的旧记录应该被作废"
+    
+    assert rag.add_document_from_file(str(text_file)) == reindexed_ids, "已写入向量索引的相同内容应该跳过导入"
+    assert document_db.index.ntotal == 1
+    print("✅ 缺少向量的重复文档已重新导入")
+    
+    return True
 
 def main():
     """主函数"""
@@ -238,11 +355,16 @@ def main():
         print("  pip install faiss-gpu  # 如果有GPU支持")
         return
     
+    # 以脚本方式运行时手动提供临时目录，代替pytest的tmp_path
+    temp_dir = tempfile.TemporaryDirectory()
     tests = [
         ("FAISS基本功能", test_faiss_installation),
-        ("FAISS文档数据库", test_faiss_document_db),
-        ("FAISS embedding集成", test_faiss_with_embeddings),
-        ("RAG系统", test_rag_system)
+        ("FAISS文档数据库", lambda: test_faiss_document_db(Path(temp_dir.name))),
+        ("FAISS embedding集成", lambda: test_faiss_with_embeddings(Path(temp_dir.name))),
+        ("检索阈值", lambda: test_similarity_threshold_rejects_unrelated(Path(temp_dir.name))),
+        ("fp16标量量化召回率", test_fp16_scalar_quantizer_recall),
+        ("RAG系统", lambda: test_rag_system(Path(temp_dir.name))),
+        ("重复文件向量修复", lambda: test_duplicate_file_reindexes_missing_vectors(Path(temp_dir.name)))
     ]
     
     passed = 0
@@ -261,6 +383,8 @@ def main():
             failed += 1
             print(f"❌ {test_name} 异常: {e}")
     
+    temp_dir.cleanup()
+    
     print(f"\n{'='*50}")
     print(f"📊 测试结果: {passed} 通过, {failed} 失败")
     
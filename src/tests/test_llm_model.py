@@ -1,5 +1,13 @@
+import os
+import pytest
+from dotenv import load_dotenv
 from src.model.chat.azure_openai_model import AzureOpenAIModel
 
+load_dotenv()
+
+
+@pytest.mark.network
+@pytest.mark.skipif(not os.getenv("AZURE_OPENAI_ENDPOINT"), reason="未配置Azure OpenAI环境变量")
 def test_azure_openai_model():
     try:
         llm = AzureOpenAIModel()
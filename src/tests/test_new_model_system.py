@@ -4,9 +4,12 @@
 
 import os
 import sys
+import pytest
+from dotenv import load_dotenv
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
 
 def test_model_registry():
     """测试模型注册仓库"""
@@ -58,6 +61,8 @@ def test_settings_integration():
         print(f"❌ Error getting LLM from settings: {e}")
 
 
+@pytest.mark.network
+@pytest.mark.skipif(not os.getenv("AZURE_OPENAI_ENDPOINT"), reason="未配置Azure OpenAI环境变量")
 def test_model_invocation():
     """测试模型调用"""
     print("\n🧪 Testing Model Invocation...")
@@ -9,8 +9,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from dataclasses import dataclass
 from src.config.prompt_manager import get_prompt_manager
+from src.tests.output_buffer import buffered_output
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MockDocument:
     """模拟文档对象"""
     document_id: str
@@ -19,6 +20,42 @@ class MockDocument:
     file_path: str
     similarity_score: float
 
+# 模拟文档在模块导入时构建一次，各测试共享（MockDocument不可变）
+MOCK_DOCUMENTS = [
+    MockDocument(
+        document_id="doc_001",
+        title="Python 编程基础",
+        content="Python是一种高级编程语言，具有简洁的语法和强大的功能。它广泛用于数据科学、Web开发、自动化脚本等领域。Python的设计哲学强调代码的可读性，通过使用缩进来表示代码块。",
+        file_path="docs/python_basics.md",
+        similarity_score=0.92
+    ),
+    MockDocument(
+        document_id="doc_002",
+        title="机器学习入门",
+        content="机器学习是人工智能的一个分支，它使计算机能够在没有明确编程的情况下学习和改进性能。常见的机器学习算法包括线性回归、决策树、神经网络等。",
+        file_path="docs/ml_intro.pdf",
+        similarity_score=0.75
+    ),
+    MockDocument(
+        document_id="doc_003",
+        title="数据可视化指南",
+        content="数据可视化是将复杂数据转换为图形表示的过程，以便更好地理解和分析数据。常用的可视化库包括matplotlib、seaborn、plotly等。",
+        file_path="guides/data_visualization.md",
+        similarity_score=0.68
+    )
+]
+
+LONG_CONTENT = "这是一个" + "非常" * 200 + "长的文档内容"
+
+LONG_CONTENT_DOC = MockDocument(
+    document_id="long_doc",
+    title="超长文档",
+    content=LONG_CONTENT,
+    file_path="long_document.txt",
+    similarity_score=0.9
+)
+
+@buffered_output
 def test_prompt_manager():
     """测试Prompt管理器"""
     
@@ -33,31 +70,6 @@ def test_prompt_manager():
     print(f"📋 可用模板: {templates}")
     print()
     
-    # 创建模拟文档
-    documents = [
-        MockDocument(
-            document_id="doc_001",
-            title="Python 编程基础",
-            content="Python是一种高级编程语言，具有简洁的语法和强大的功能。它广泛用于数据科学、Web开发、自动化脚本等领域。Python的设计哲学强调代码的可读性，通过使用缩进来表示代码块。",
-            file_path="docs/python_basics.md",
-            similarity_score=0.92
-        ),
-        MockDocument(
-            document_id="doc_002",
-            title="机器学习入门",
-            content="机器学习是人工智能的一个分支，它使计算机能够在没有明确编程的情况下学习和改进性能。常见的机器学习算法包括线性回归、决策树、神经网络等。",
-            file_path="docs/ml_intro.pdf",
-            similarity_score=0.75
-        ),
-        MockDocument(
-            document_id="doc_003",
-            title="数据可视化指南",
-            content="数据可视化是将复杂数据转换为图形表示的过程，以便更好地理解和分析数据。常用的可视化库包括matplotlib、seaborn、plotly等。",
-            file_path="guides/data_visualization.md",
-            similarity_score=0.68
-        )
-    ]
-    
     # 测试结构化RAG prompt
     user_question = "如何开始学习Python编程？"
     
@@ -67,7 +79,7 @@ def test_prompt_manager():
     print()
     
     try:
-        structured_prompt = prompt_manager.get_structured_rag_prompt(user_question, documents)
+        structured_prompt = prompt_manager.get_structured_rag_prompt(user_question, MOCK_DOCUMENTS)
         print("✅ 生成的结构化Prompt:")
         print(structured_prompt)
         print()
@@ -116,6 +128,7 @@ def test_prompt_manager():
     print("\n" + "=" * 80)
     print("🎉 Prompt模板系统测试完成！")
 
+@buffered_output
 def test_template_edge_cases():
     """测试模板边界情况"""
     
@@ -136,16 +149,8 @@ def test_template_edge_cases():
     
     # 测试超长内容
     print("\n📝 测试超长内容:")
-    long_content_doc = MockDocument(
-        document_id="long_doc",
-        title="超长文档",
-        content="这是一个" + "非常" * 200 + "长的文档内容",
-        file_path="long_document.txt",
-        similarity_score=0.9
-    )
-    
     try:
-        long_prompt = prompt_manager.get_structured_rag_prompt("测试", [long_content_doc])
+        long_prompt = prompt_manager.get_structured_rag_prompt("测试", [LONG_CONTENT_DOC])
         print("✅ 超长内容处理成功")
         print(f"生成的prompt长度: {len(long_prompt)} 字符")
         
@@ -3,7 +3,15 @@
 RAG系统测试脚本
 """
 
+import atexit
+import hashlib
+import io
+import os
+import shutil
 import sys
+import tempfile
+import traceback
+from functools import lru_cache
 from pathlib import Path
 
 # 添加项目路径
@@ -12,14 +20,69 @@ sys.path.append(str(Path(__file__).parent))
 from src.agent.conversation_agent import create_agent
 from src.rag.rag_system import RAGSystem
 from src.database.faiss_document_db import FAISSDocumentDatabase
+from src.tests.output_buffer import buffered_output
+from src.config.settings_store import default_setting_store
+from src.global_configuration.embedding_registry import get_embedding
 
+# 临时测试文件优先放在内存文件系统中，避免磁盘IO
+TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+@lru_cache(maxsize=1)
+def shared_rag_system() -> RAGSystem:
+    """各测试共享同一个RAGSystem，只加载一次embedding模型并打开一次向量库"""
+    # 与 rag_manager.main 一样按设置获取embedding；文档库建在临时目录中，不改动 database/ 下的数据
+    embeddings = get_embedding(default_setting_store.embedding_model_name)
+    # 在测试内（联网保护已生效）才开始后台预热embedding模型，与下面打开文档库并行；收集阶段不做任何初始化
+    if embeddings is not None:
+        embeddings.prefetch()
+    db_dir = tempfile.mkdtemp(prefix="yomi_rag_test_", dir=TEMP_DIR)
+    atexit.register(shutil.rmtree, db_dir, True)
+    document_db = FAISSDocumentDatabase(os.path.join(db_dir, "documents.db"), os.path.join(db_dir, "vectors.index"))
+    return RAGSystem(document_db, embeddings)
+
+# 已生成的测试PDF，按文本内容的哈希缓存，相同内容只生成一次
+_PDF_CACHE = {}
+
+def create_test_pdf(content: str, file_path: str):
+    """创建测试用的PDF文件，相同内容直接写入缓存的PDF字节"""
+    key = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    if key not in _PDF_CACHE:
+        try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen.canvas import Canvas
+            
+            # 测试只需要能被解析的PDF，直接逐行写入文本，跳过platypus的段落排版和分页计算
+            buffer = io.BytesIO()
+            canvas = Canvas(buffer, pagesize=letter)
+            page_top, line_height, lines_per_page = 750, 12, 58
+            
+            lines = [line.strip() for line in content.splitlines() if line.strip()]
+            for i, line in enumerate(lines):
+                if i > 0 and i % lines_per_page == 0:
+                    canvas.showPage()
+                canvas.drawString(50, page_top - (i % lines_per_page) * line_height, line)
+            
+            canvas.save()
+            _PDF_CACHE[key] = buffer.getvalue()
+        except ImportError:
+            print("⚠️ 需要安装reportlab库来创建测试PDF文件")
+            print("运行: pip install reportlab")
+            return False
+        except Exception as e:
+            print(f"⚠️ 创建测试PDF文件失败: {e}")
+            return False
+    
+    Path(file_path).write_bytes(_PDF_CACHE[key])
+    return True
+
+@buffered_output
 def test_rag_basic():
     """基本RAG功能测试"""
     print("🧪 开始RAG系统基本功能测试")
     print("=" * 50)
     
     # 创建RAG系统
-    rag_system = RAGSystem()
+    rag_system = shared_rag_system()
     
     # 添加测试文档
     print("\n1. 添加测试文档...")
@@ -73,17 +136,14 @@ def test_rag_basic():
     # 测试搜索
     print("\n2. 测试文档搜索...")
     
-    # 搜索Python相关内容
-    print("\n🔍 搜索 'Python编程':")
-    results = rag_system.search_relevant_documents("Python编程", top_k=3)
-    for i, doc in enumerate(results, 1):
-        print(f"   {i}. {doc.title} (相似度: {doc.similarity_score:.2f})")
-    
-    # 搜索数据库相关内容
-    print("\n🔍 搜索 'SQLite数据库':")
-    results = rag_system.search_relevant_documents("SQLite数据库", top_k=3)
-    for i, doc in enumerate(results, 1):
-        print(f"   {i}. {doc.title} (相似度: {doc.similarity_score:.2f})")
+    # 批量搜索Python和数据库相关内容，只生成一次embedding、搜索一次索引
+    test_queries = ["Python编程", "SQLite数据库"]
+    all_results = rag_system.search_relevant_documents_batch(test_queries, top_k=3)
+    assert len(all_results) == len(test_queries)
+    for query, results in zip(test_queries, all_results):
+        print(f"\n🔍 搜索 '{query}':")
+        for i, doc in enumerate(results, 1):
+            print(f"   {i}. {doc.title} (相似度: {doc.similarity_score:.2f})")
     
     # 测试上下文格式化
     print("\n3. 测试上下文格式化...")
@@ -107,6 +167,7 @@ def test_rag_basic():
     
     print("\n✅ 基本功能测试完成!")
 
+@buffered_output
 def test_agent_with_rag():
     """测试Agent与RAG集成"""
     print("\n🤖 开始Agent与RAG集成测试")
@@ -196,48 +257,21 @@ def test_agent_with_rag():
     
     print("\n✅ Agent与RAG集成测试完成!")
 
+@buffered_output
 def test_rag_pdf_integration():
     """测试RAG系统与PDF文档的集成"""
     print("\n🧪 测试RAG系统PDF集成功能")
     print("=" * 50)
     
     # 创建RAG系统
-    rag_system = RAGSystem()
+    rag_system = shared_rag_system()
     
     # 创建测试PDF文件
     import tempfile
     import os
     
-    def create_test_pdf(content: str, file_path: str):
-        """创建测试用的PDF文件"""
-        try:
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet
-            
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # 分段添加内容
-            paragraphs = content.split('\n\n')
-            for paragraph in paragraphs:
-                if paragraph.strip():
-                    story.append(Paragraph(paragraph, styles['Normal']))
-                    story.append(Spacer(1, 12))
-            
-            doc.build(story)
-            return True
-        except ImportError:
-            print("⚠️ 需要安装reportlab库来创建测试PDF文件")
-            print("运行: pip install reportlab")
-            return False
-        except Exception as e:
-            print(f"⚠️ 创建测试PDF文件失败: {e}")
-            return False
-    
     # 创建临时PDF文件
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False, dir=TEMP_DIR) as tmp_file:
         tmp_path = tmp_file.name
     
     try:
@@ -367,12 +401,13 @@ def test_rag_pdf_integration():
             pass
 
 
+@buffered_output
 def test_pdf_vs_regular_documents():
     """测试PDF文档与常规文档的处理差异"""
     print("\n🧪 测试PDF文档与常规文档的处理差异")
     print("=" * 50)
     
-    rag_system = RAGSystem()
+    rag_system = shared_rag_system()
     
     # 创建测试内容
     test_content = """
@@ -394,7 +429,7 @@ def test_pdf_vs_regular_documents():
     import tempfile
     import os
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as tmp_file:
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8', dir=TEMP_DIR) as tmp_file:
         tmp_file.write(test_content)
         txt_path = tmp_file.name
     
@@ -411,32 +446,7 @@ def test_pdf_vs_regular_documents():
         # 2. 创建相同内容的PDF文档
         print("\n2. 添加PDF文档...")
         
-        def create_test_pdf(content: str, file_path: str):
-            try:
-                from reportlab.lib.pagesizes import letter
-                from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-                from reportlab.lib.styles import getSampleStyleSheet
-                
-                doc = SimpleDocTemplate(file_path, pagesize=letter)
-                styles = getSampleStyleSheet()
-                story = []
-                
-                paragraphs = content.split('\n\n')
-                for paragraph in paragraphs:
-                    if paragraph.strip():
-                        story.append(Paragraph(paragraph, styles['Normal']))
-                        story.append(Spacer(1, 12))
-                
-                doc.build(story)
-                return True
-            except ImportError:
-                print("⚠️ 需要reportlab库")
-                return False
-            except Exception as e:
-                print(f"⚠️ 创建PDF失败: {e}")
-                return False
-        
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False, dir=TEMP_DIR) as tmp_file:
             pdf_path = tmp_file.name
         
         try:
@@ -454,8 +464,12 @@ def test_pdf_vs_regular_documents():
                 
                 results = rag_system.search_relevant_documents("Python编程", top_k=5)
                 
-                txt_results = [r for r in results if r.metadata.get('file_type') == '.txt']
-                pdf_results = [r for r in results if r.metadata.get('file_type') == '.pdf']
+                # 一次遍历按文件类型分组
+                results_by_type = {}
+                for r in results:
+                    results_by_type.setdefault(r.metadata.get('file_type'), []).append(r)
+                txt_results = results_by_type.get('.txt', [])
+                pdf_results = results_by_type.get('.pdf', [])
                 
                 print(f"   找到 {len(txt_results)} 个TXT文档结果")
                 print(f"   找到 {len(pdf_results)} 个PDF文档结果")
@@ -498,25 +512,27 @@ def main():
     print("🚀 开始RAG系统测试")
     print("=" * 60)
     
-    try:
-        # 基本功能测试
-        test_rag_basic()
-        
-        # Agent集成测试
-        test_agent_with_rag()
-        
-        # PDF集成测试
-        test_rag_pdf_integration()
-        
-        # PDF与常规文档对比测试
-        test_pdf_vs_regular_documents()
-        
+    tests = [
+        ("基本功能", test_rag_basic),
+        ("Agent集成", test_agent_with_rag),
+        ("PDF集成", test_rag_pdf_integration),
+        ("PDF与常规文档对比", test_pdf_vs_regular_documents)
+    ]
+    
+    # 各测试独立捕获异常，一个失败不影响后续测试
+    failed = 0
+    for test_name, test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            failed += 1
+            print(f"\n❌ {test_name}测试失败: {e}")
+            traceback.print_exc()
+    
+    if failed == 0:
         print("\n🎉 所有测试完成!")
-        
-    except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+    else:
+        print(f"\n⚠️ {failed}/{len(tests)} 个测试失败")
 
 if __name__ == '__main__':
     main()
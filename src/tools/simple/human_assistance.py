@@ -1,7 +1,36 @@
-from langchain_core.tools import tool
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
 
-@tool
-def human_assistance(query: str) -> str:
+from langchain_core.tools import StructuredTool
+
+# 异步调用时从回答队列等待人工回答的超时时间（秒）
+HUMAN_RESPONSE_TIMEOUT = 300.0
+
+# 每个会话可注入自己的回答队列（如WebSocket推送的回答），未设置时从终端读取
+human_response_queue: ContextVar[Optional[asyncio.Queue]] = ContextVar("human_response_queue", default=None)
+
+HUMAN_PROMPT = "💭 请提供您的回答: "
+
+
+def _print_request(query: str):
+    """打印人工协助请求"""
+    print(f"\n🙋‍♂️ 人工协助请求:")
+    print(f"📝 问题: {query}")
+    print("-" * 40)
+
+
+def _format_response(human_response: str) -> str:
+    """整理人工回答"""
+    human_response = human_response.strip()
+    if not human_response:
+        return "用户未提供回答"
+    
+    print(f"✅ 收到人工回答: {human_response}")
+    return human_response
+
+
+def _human_assistance(query: str) -> str:
     """Request assistance from a human for complex problems that require human judgment or expertise.
     
     Args:
@@ -10,15 +39,32 @@ def human_assistance(query: str) -> str:
     Returns:
         Human response to the query
     """
-    print(f"\n🙋‍♂️ 人工协助请求:")
-    print(f"📝 问题: {query}")
-    print("-" * 40)
+    _print_request(query)
     
     # 获取人工输入
-    human_response = input("💭 请提供您的回答: ").strip()
+    return _format_response(input(HUMAN_PROMPT))
+
+
+async def _ahuman_assistance(query: str) -> str:
+    """异步等待人工回答，不阻塞事件循环；从回答队列等待时超时后直接返回"""
+    _print_request(query)
     
-    if not human_response:
-        return "用户未提供回答"
+    queue = human_response_queue.get()
+    if queue is None:
+        # 线程中阻塞的input()无法被取消，超时后残留的线程会吞掉下一行输入，因此终端读取不设超时
+        return _format_response(await asyncio.to_thread(input, HUMAN_PROMPT))
     
-    print(f"✅ 收到人工回答: {human_response}")
-    return human_response
\ No newline at end of file
+    try:
+        human_response = await asyncio.wait_for(queue.get(), timeout=HUMAN_RESPONSE_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("⏰ 等待人工回答超时")
+        return "用户未在规定时间内回答"
+    
+    return _format_response(human_response)
+
+
+human_assistance = StructuredTool.from_function(
+    func=_human_assistance,
+    coroutine=_ahuman_assistance,
+    name="human_assistance",
+)
@@ -1,12 +1,17 @@
-from typing import Optional
-from googleapiclient.discovery import build
+from typing import Optional, Any
+from urllib.parse import quote_plus, urlencode
 from langchain_core.callbacks import (
     AsyncCallbackManagerForToolRun,
     CallbackManagerForToolRun,
 )
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.tools.subclass.http_client import get_async_client, get_sync_client
+from src.tools.subclass.search_cache import SearchResultCache
+
+GOOGLE_CUSTOM_SEARCH_URL = 'https://www.googleapis.com/customsearch/v1'
 
 class GoogleSearchInput(BaseModel):
     query: str = Field(description="The search query")
@@ -19,15 +24,43 @@ class GoogleSearchTool(BaseTool):
 
     api_key: str
     cse_id: str
+    # 可选的嵌入模型，设置后近似的查询也可以命中缓存
+    embeddings: Optional[Any] = None
+
+    # 查询结果缓存，重复或近似的查询不再消耗API配额
+    _cache: Optional[SearchResultCache] = PrivateAttr(default=None)
+    # 预先拼好包含api_key和cse_id的请求URL前缀，每次查询只需追加q参数
+    _url_prefix: Optional[str] = PrivateAttr(default=None)
+
+    def _get_cache(self) -> SearchResultCache:
+        """懒加载查询结果缓存"""
+        if self._cache is None:
+            self._cache = SearchResultCache(embeddings=self.embeddings)
+        return self._cache
+
+    def _search(self, query: str) -> list:
+        """直接请求Custom Search REST接口，使用进程共享的线程安全httpx.Client，可在多个线程中并发调用"""
+        response = get_sync_client().get(self._get_url_prefix() + quote_plus(query))
+        response.raise_for_status()
+        return response.json().get('items', [])
+
+    def _get_url_prefix(self) -> str:
+        """懒加载请求URL前缀，常量参数只编码一次"""
+        if self._url_prefix is None:
+            self._url_prefix = f"{GOOGLE_CUSTOM_SEARCH_URL}?{urlencode({'key': self.api_key, 'cx': self.cse_id})}&q="
+        return self._url_prefix
+
+    async def _asearch(self, query: str) -> list:
+        """直接请求Custom Search REST接口，不阻塞事件循环，连接由共享的AsyncClient复用"""
+        response = await get_async_client().get(self._get_url_prefix() + quote_plus(query))
+        response.raise_for_status()
+        return response.json().get('items', [])
 
     def _run(
         self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> list:
         """Use the tool."""
-        service = build("customsearch", "v1", developerKey=self.api_key)
-        res = service.cse().list(q=query, cx=self.cse_id).execute()
-        results = res.get('items', [])
-        return results
+        return self._get_cache().get_or_search(query, self._search)
 
     async def _arun(
         self,
@@ -35,6 +68,6 @@ class GoogleSearchTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> list:
         """Use the tool asynchronously."""
-        return self._run(query, run_manager=run_manager.get_sync())
+        return await self._get_cache().aget_or_search(query, self._asearch)
 
 
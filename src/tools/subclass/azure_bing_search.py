@@ -1,4 +1,6 @@
-from typing import Optional
+import asyncio
+from typing import Any, Optional
+from azure.ai.agents.models import BingGroundingTool
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 from langchain_core.callbacks import (
@@ -7,7 +9,9 @@ from langchain_core.callbacks import (
 )
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.tools.subclass.search_cache import SearchResultCache
 
 
 class BingSearchInput(BaseModel):
@@ -22,29 +26,60 @@ class BingSearchTool(BaseTool):
 
     project_endpoint: str
     connection_id: str
+    # 可选的嵌入模型，设置后近似的查询也可以命中缓存
+    embeddings: Optional[Any] = None
+
+    # 查询结果缓存，重复或近似的查询不再创建新的agent和线程
+    _cache: Optional[SearchResultCache] = PrivateAttr(default=None)
+    # 客户端、凭据和agent在实例内复用，避免每次查询都重新获取token和创建agent
+    _credential: Any = PrivateAttr(default=None)
+    _client: Any = PrivateAttr(default=None)
+    _agent: Any = PrivateAttr(default=None)
+
+    def _get_cache(self) -> SearchResultCache:
+        """懒加载查询结果缓存"""
+        if self._cache is None:
+            self._cache = SearchResultCache(embeddings=self.embeddings)
+        return self._cache
 
     def _run(
             self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> list:
         """Use the tool."""
-        project_client = AIProjectClient(endpoint=self.project_endpoint, credential=DefaultAzureCredential())
-        bing_tool = BingGroundingTool(connection_id=self.connection_id)
+        return self._get_cache().get_or_search(query, self._search)
 
-        with project_client:
-            agent = project_client.agents.create_agent(
+    def _get_client(self) -> AIProjectClient:
+        """懒加载AIProjectClient，凭据随客户端一起复用"""
+        if self._client is None:
+            self._credential = DefaultAzureCredential()
+            self._client = AIProjectClient(endpoint=self.project_endpoint, credential=self._credential)
+        return self._client
+
+    def _get_agent(self):
+        """懒创建带Bing grounding工具的agent，只创建一次"""
+        if self._agent is None:
+            bing_tool = BingGroundingTool(connection_id=self.connection_id)
+            self._agent = self._get_client().agents.create_agent(
                 model="YOUR_MODEL_DEPLOYMENT_NAME",
                 name="my-agent",
                 instructions="You are a helpful agent",
                 tools=bing_tool.definitions,
             )
-            thread = project_client.agents.threads.create()
-            message = project_client.agents.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=query,
-            )
-            results = project_client.agents.messages.get(thread_id=thread.id)
-            return results
+        return self._agent
+
+    def _search(self, query: str) -> list:
+        """通过Bing grounding agent执行查询，每次查询只新建线程"""
+        project_client = self._get_client()
+        self._get_agent()
+        
+        thread = project_client.agents.threads.create()
+        message = project_client.agents.messages.create(
+            thread_id=thread.id,
+            role="user",
+            content=query,
+        )
+        results = project_client.agents.messages.get(thread_id=thread.id)
+        return results
 
     async def _arun(
             self,
@@ -52,7 +87,8 @@ class BingSearchTool(BaseTool):
             run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> list:
         """Use the tool asynchronously."""
-        return self._run(query, run_manager=run_manager.get_sync())
+        # azure-ai-projects的同步客户端会阻塞，放到线程中执行
+        return await asyncio.to_thread(self._run, query)
 
 
 # 使用你的项目端点和连接ID
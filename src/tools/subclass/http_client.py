@@ -0,0 +1,75 @@
+import asyncio
+import atexit
+import json
+import threading
+import weakref
+from typing import Any, Optional
+
+import httpx
+
+# HTTP/2需要可选依赖h2，未安装时退回HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 安装了orjson时用它解析响应体，比标准库json快数倍
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 连接池上限与空闲连接保活时间
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+HTTP_TIMEOUT = 30.0
+
+# AsyncClient的连接池绑定在创建它的事件循环上，因此每个事件循环各共享一个客户端。
+# 客户端需要在所属事件循环结束前用 aclose_async_client() 关闭（服务端在FastAPI lifespan关闭阶段调用），
+# 否则事件循环被回收时连接池中的连接不会被关闭
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+# 同步Client线程安全，整个进程共享一个
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+
+
+def get_sync_client() -> httpx.Client:
+    """获取进程共享的httpx.Client，复用TCP/TLS连接，进程退出时关闭"""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(http2=HTTP2_AVAILABLE, timeout=HTTP_TIMEOUT, limits=HTTP_POOL_LIMITS)
+                atexit.register(_sync_client.close)
+    return _sync_client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环共享的AsyncClient，复用TCP/TLS连接，避免每次请求重新握手
+    
+    面向长期运行的服务端事件循环；在 asyncio.run() 等短生命周期的事件循环中使用时，
+    需要在循环结束前 await aclose_async_client()
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=HTTP_TIMEOUT, limits=HTTP_POOL_LIMITS)
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """关闭当前事件循环的共享AsyncClient，之后再调用get_async_client()会重新创建"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def loads_response(response: httpx.Response) -> Any:
+    """直接从响应的原始字节解析JSON，优先使用orjson"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
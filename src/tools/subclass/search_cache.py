@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from src.model.embedding.base_embedding import BaseManagedEmbedding
+
+# 精确匹配未命中的标记，缓存的结果本身可能是None
+_MISS = object()
+
+class SearchResultCache:
+    """搜索结果缓存：按规范化查询精确匹配的LRU缓存，可选按embedding余弦相似度匹配近似查询"""
+
+    def __init__(self, maxsize: int = 512, embeddings: Optional[BaseManagedEmbedding] = None,
+                 similarity_threshold: float = 0.95, semantic_maxsize: int = 256):
+        """
+        Args:
+            maxsize: 精确匹配缓存的最大条数
+            embeddings: 嵌入模型，为None时只使用精确匹配
+            similarity_threshold: 近似查询命中所需的最小余弦相似度
+            semantic_maxsize: 近似匹配缓存的最大条数，超出后先进先出淘汰
+        """
+        self.maxsize = maxsize
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.semantic_maxsize = semantic_maxsize
+        self._exact: "OrderedDict[str, Any]" = OrderedDict()
+        self._semantic: List[Tuple[np.ndarray, Any]] = []
+        # 工具可能在多个线程中并发调用（asyncio.to_thread、并发搜索），读写缓存时加锁；
+        # 执行搜索和生成embedding时不持有锁
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """规范化查询：去除首尾空白、合并连续空白并转为小写"""
+        return ' '.join(query.split()).lower()
+
+    def get_or_search(self, query: str, search: Callable[[str], Any]) -> Any:
+        """命中缓存直接返回结果，否则调用search执行查询并写入缓存"""
+        key = self.normalize_query(query)
+        result = self._lookup(key)
+        if result is not _MISS:
+            return result
+        
+        query_vector = None
+        if self.embeddings is not None:
+            query_vector = self._normalize_vector(self.embeddings.embed_query(key))
+            result = self._find_similar(query_vector)
+            if result is not None:
+                return result
+        
+        result = search(query)
+        self._store(key, query_vector, result)
+        return result
+
+    async def aget_or_search(self, query: str, search: Callable[[str], Awaitable[Any]]) -> Any:
+        """get_or_search的异步版本，search为协程函数"""
+        key = self.normalize_query(query)
+        result = self._lookup(key)
+        if result is not _MISS:
+            return result
+        
+        query_vector = None
+        if self.embeddings is not None:
+            query_vector = self._normalize_vector(await self.embeddings.aembed_query(key))
+            result = self._find_similar(query_vector)
+            if result is not None:
+                return result
+        
+        result = await search(query)
+        self._store(key, query_vector, result)
+        return result
+
+    def _lookup(self, key: str) -> Any:
+        """精确匹配查找，命中时刷新LRU顺序并返回结果，未命中返回_MISS"""
+        with self._lock:
+            result = self._exact.get(key, _MISS)
+            if result is not _MISS:
+                self._exact.move_to_end(key)
+            return result
+
+    def _store(self, key: str, query_vector: Optional[np.ndarray], result: Any):
+        """写入精确匹配缓存和近似匹配缓存，超出容量时淘汰最旧的条目"""
+        with self._lock:
+            self._exact[key] = result
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.maxsize:
+                self._exact.popitem(last=False)
+            
+            if query_vector is not None:
+                self._semantic.append((query_vector, result))
+                if len(self._semantic) > self.semantic_maxsize:
+                    self._semantic.pop(0)
+
+    @staticmethod
+    def _normalize_vector(embedding: List[float]) -> np.ndarray:
+        """归一化查询向量，点积即余弦相似度"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _find_similar(self, query_vector: np.ndarray) -> Optional[Any]:
+        """在近似匹配缓存中查找相似度最高且超过阈值的结果"""
+        # 在锁内取快照，相似度计算在锁外进行
+        with self._lock:
+            entries = list(self._semantic)
+        if not entries:
+            return None
+        
+        cached_vectors = np.stack([vector for vector, _ in entries])
+        similarities = cached_vectors @ query_vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return entries[best][1]
+        return None
@@ -1,15 +1,35 @@
-from typing import Optional, Any, Coroutine
-from envs.dra.Lib.typing import LiteralString
-from googleapiclient.discovery import build
+import asyncio
+from typing import Optional, Any, List
 from langchain_core.callbacks import (
     AsyncCallbackManagerForToolRun,
     CallbackManagerForToolRun,
 )
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
-from pydantic import BaseModel, Field
-from langchain_tavily import TavilySearch
-import httpx
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.tools.subclass.http_client import get_async_client, get_sync_client, loads_response
+
+BIGMODEL_TOOLS_URL = 'https://open.bigmodel.cn/api/paas/v4/tools'
+
+def _web_search_payload(query: str) -> dict:
+    """构造web-search-pro请求体"""
+    return {
+        'tool': 'web-search-pro',
+        'messages': [
+            {'role': 'user', 'content': query}
+        ],
+        'stream': False
+    }
+
+def _join_search_results(data: dict) -> str:
+    """拼接web-search-pro响应中所有search_result的内容"""
+    return '\n\n\n'.join(
+        result['content']
+        for choice in data['choices']
+        for message in choice['message']['tool_calls']
+        for result in message.get('search_result') or ()
+    )
 
 class BigModelSearchInput(BaseModel):
     query: str = Field(description="The search query")
@@ -26,29 +46,14 @@ class BigModelSearchTool(BaseTool):
             self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> list:
         """Use the tool."""
-        with httpx.Client() as client:
-            response = client.post(
-                'https://open.bigmodel.cn/api/paas/v4/tools',
-                headers={'Authorization': self.api_key},
-                json={
-                    'tool': 'web-search-pro',
-                    'messages': [
-                        {'role': 'user', 'content': query}
-                    ],
-                    'stream': False
-                }
-            )
-
-        res_data = []
-        for choice in response.json()['choices']:
-            for message in choice['message']['tool_calls']:
-                search_results = message.get('search_result')
-                if not search_results:
-                    continue
-                for result in search_results:
-                    res_data.append(result['content'])
-
-        return '\n\n\n'.join(res_data)
+        # 使用进程共享的Client，复用到open.bigmodel.cn的连接
+        response = get_sync_client().post(
+            BIGMODEL_TOOLS_URL,
+            headers={'Authorization': self.api_key},
+            json=_web_search_payload(query)
+        )
+
+        return _join_search_results(loads_response(response))
 
     async def _arun(
         self,
@@ -56,29 +61,25 @@ class BigModelSearchTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> list:
         """Use the tool asynchronously."""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://open.bigmodel.cn/api/paas/v4/tools',
-                headers={'Authorization': self.api_key},
-                json={
-                    'tool': 'web-search-pro',
-                    'messages': [
-                        {'role': 'user', 'content': query}
-                    ],
-                    'stream': False
-                }
-            )
-
-            res_data = []
-            for choice in response.json()['choices']:
-                for message in choice['message']['tool_calls']:
-                    search_results = message.get('search_result')
-                    if not search_results:
-                        continue
-                    for result in search_results:
-                        res_data.append(result['content'])
-
-            return '\n\n\n'.join(res_data)
+        response = await get_async_client().post(
+            BIGMODEL_TOOLS_URL,
+            headers={'Authorization': self.api_key},
+            json=_web_search_payload(query)
+        )
+
+        return _join_search_results(loads_response(response))
+
+    async def asearch_many(self, queries: List[str]) -> List[str]:
+        """
+        并发执行多个搜索，请求共用当前事件循环的AsyncClient连接池
+
+        Args:
+            queries: 搜索词列表
+
+        Returns:
+            与queries顺序一致的搜索结果列表
+        """
+        return list(await asyncio.gather(*(self._arun(query) for query in queries)))
 
 class TavilySearchInput(BaseModel):
     query: str = Field(description="The search query")
@@ -90,12 +91,22 @@ class TavilySearchTool(BaseTool):
     return_direct: bool = True
     api_key: str
 
+    # 缓存TavilySearch实例，避免每次查询都重新创建
+    _client: Any = PrivateAttr(default=None)
+
+    def _get_client(self):
+        """懒加载TavilySearch客户端"""
+        if self._client is None:
+            # langchain_tavily导入耗时较长，只在第一次真正使用Tavily时导入
+            from langchain_tavily import TavilySearch
+            self._client = TavilySearch(max_results=2, tavily_api_key=self.api_key)
+        return self._client
+
     def _run(
         self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> list:
         """Use the tool."""
-        client = TavilySearch(max_results=2)
-        return client.invoke(query=query, api_key=self.api_key)
+        return self._get_client().invoke({"query": query})
 
     async def _arun(
         self,
@@ -103,5 +114,6 @@ class TavilySearchTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> list:
         """Use the tool asynchronously."""
-        return self._run(query, run_manager=run_manager.get_sync())
+        # 使用TavilySearch原生的异步接口，不阻塞事件循环
+        return await self._get_client().ainvoke({"query": query})
 
@@ -1,23 +1,19 @@
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.tools import BaseTool
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.model.chat.base_model import BaseManagedModel
+from src.model.embedding.base_embedding import BaseManagedEmbedding
+from src.utils.document_format_utils import extract_first_json_object
 from src.tools.simple.math import add, multiply
 from src.tools.simple.human_assistance import human_assistance
 import json
-import re
+import numpy as np
 
 
-class ToolMatcher:
-    """工具匹配器，用于检测用户输入是否需要调用工具"""
-    
-    def __init__(self, llm: BaseManagedModel, tools: Optional[List[BaseTool]]):
-        self.llm = llm
-        self.available_tools = tools or []
-        print(f"🔧 [ToolMatcher] 初始化，可用工具: {[tool.name for tool in self.available_tools]}")
-        self.tool_detection_prompt = ChatPromptTemplate.from_messages([
-            ("system", """你是一个工具检测助手。分析用户的输入，判断是否需要调用工具。
+# 工具检测系统提示词，{available_tools}在ToolMatcher初始化时替换为工具模式描述
+_TOOL_DETECTION_SYSTEM_PROMPT = """你是一个工具检测助手。分析用户的输入，判断是否需要调用工具。
 
 可用工具：
 {available_tools}
@@ -41,7 +37,54 @@ class ToolMatcher:
     "reason": "不需要工具的原因"
 }}
 
-用户输入：{user_input}"""),
+用户输入：{user_input}"""
+
+
+@lru_cache(maxsize=None)
+def _cached_model_schema(schema_cls) -> Dict[str, Any]:
+    """参数模型类是不可变的常量，JSON schema每个类只生成一次（返回共享dict，调用方不要修改）"""
+    return schema_cls.model_json_schema()
+
+
+def _get_args_schema(tool: BaseTool) -> Dict[str, Any]:
+    """获取工具参数的JSON schema，args_schema本身已是dict时直接返回"""
+    if not tool.args_schema:
+        return {}
+    if isinstance(tool.args_schema, dict):
+        return tool.args_schema
+    return _cached_model_schema(tool.args_schema)
+
+
+class ToolMatcher:
+    """工具匹配器，用于检测用户输入是否需要调用工具"""
+    
+    # 各工具的使用示例
+    TOOL_EXAMPLES = {
+        "add": "例如：计算 5 + 3 = 8",
+        "multiply": "例如：计算 4 × 7 = 28", 
+        "human_assistance": "例如：需要人工帮助解决复杂问题"
+    }
+    
+    def __init__(self, llm: BaseManagedModel, tools: Optional[List[BaseTool]],
+                 embeddings: Optional[BaseManagedEmbedding] = None, tool_route_threshold: Optional[float] = None):
+        self.llm = llm
+        self.available_tools = tools or []
+        # 按名称索引工具，名称重复时保留第一个，与原先的顺序查找结果一致
+        self._tool_index: Dict[str, BaseTool] = {}
+        for tool in self.available_tools:
+            self._tool_index.setdefault(tool.name, tool)
+        # 设置embeddings和阈值后，先用向量相似度过滤明显不需要工具的输入，省去一次LLM调用
+        self.embeddings = embeddings
+        self.tool_route_threshold = tool_route_threshold
+        self._tool_embeddings: Optional[np.ndarray] = None
+        print(f"🔧 [ToolMatcher] 初始化，可用工具: {[tool.name for tool in self.available_tools]}")
+        # 可用工具在初始化后不再变化，工具模式描述只生成一次
+        self._tool_schemas_json = self._get_tool_schemas()
+        # 工具模式描述固定不变，预先写入系统提示词，每次调用只需替换user_input
+        # （JSON中的花括号需要转义，避免被当作模板变量）
+        escaped_schemas = self._tool_schemas_json.replace('{', '{{').replace('}', '}}')
+        self.tool_detection_prompt = ChatPromptTemplate.from_messages([
+            ("system", _TOOL_DETECTION_SYSTEM_PROMPT.replace("{available_tools}", escaped_schemas)),
         ])
     
     def _get_tool_schemas(self) -> str:
@@ -54,29 +97,70 @@ class ToolMatcher:
             schema = {
                 "name": tool.name,
                 "description": tool.description,
-                "args": tool.args_schema.schema() if tool.args_schema else {}
+                "args": _get_args_schema(tool)
             }
             schemas.append(schema)
-        return json.dumps(schemas, indent=2, ensure_ascii=False)
+        # 发给LLM的JSON不需要缩进，紧凑格式可减少prompt的token数
+        return json.dumps(schemas, separators=(',', ':'), ensure_ascii=False)
+    
+    def _get_tool_embeddings(self) -> np.ndarray:
+        """懒加载各工具描述的归一化向量矩阵，形状为 (工具数, 维度)"""
+        if self._tool_embeddings is None:
+            texts = [f"{tool.name}: {tool.description} {self._get_tool_example(tool.name)}" for tool in self.available_tools]
+            vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            self._tool_embeddings = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return self._tool_embeddings
+    
+    def _route_by_embedding(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """
+        用输入与工具描述的余弦相似度预先判断，相似度都低于阈值时直接返回不需要工具
+        
+        Returns:
+            不需要工具时返回检测结果，需要交给LLM进一步判断时返回None
+        """
+        if self.embeddings is None or self.tool_route_threshold is None or not self.available_tools:
+            return None
+        
+        try:
+            query = np.asarray(self.embeddings.embed_query(user_input), dtype=np.float32)
+            scores = self._get_tool_embeddings() @ (query / np.linalg.norm(query))
+            best_score = float(scores.max())
+        except Exception as e:
+            print(f"⚠️ 工具向量路由失败，改用LLM检测: {e}")
+            return None
+        
+        if best_score >= self.tool_route_threshold:
+            return None
+        
+        return {
+            "needs_tool": False,
+            "confidence": round(1.0 - best_score, 3),
+            "reason": f"输入与所有工具的相似度均低于阈值 ({best_score:.2f} < {self.tool_route_threshold})"
+        }
     
     def detect_tool_need(self, user_input: str) -> Dict[str, Any]:
         """检测用户输入是否需要调用工具"""
+        routed = self._route_by_embedding(user_input)
+        if routed is not None:
+            return routed
+        
         try:
-            tool_schemas = self._get_tool_schemas()
-            
             detection_chain = self.tool_detection_prompt | self.llm.model
-            response = detection_chain.invoke({
-                "available_tools": tool_schemas,
-                "user_input": user_input
-            })
+            response = detection_chain.invoke({"user_input": user_input})
             
             # 解析响应
             content = response.content.strip()
             
-            # 尝试提取JSON
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
+            # 大多数情况下响应本身就是JSON，直接解析；否则线性扫描提取第一个完整的JSON对象
+            if content.startswith('{') and content.endswith('}'):
+                try:
+                    return json.loads(content)
+                except json.JSONDecodeError:
+                    pass
+            
+            json_text = extract_first_json_object(content)
+            if json_text:
+                result = json.loads(json_text)
                 return result
             else:
                 return {
@@ -95,10 +179,7 @@ class ToolMatcher:
     
     def get_tool_by_name(self, tool_name: str) -> Optional[BaseTool]:
         """根据名称获取工具"""
-        for tool in self.available_tools:
-            if tool.name == tool_name:
-                return tool
-        return None
+        return self._tool_index.get(tool_name)
     
     def get_tool_schema(self, tool_name: str) -> Optional[Dict[str, Any]]:
         """获取工具的详细模式"""
@@ -109,24 +190,20 @@ class ToolMatcher:
         return {
             "name": tool.name,
             "description": tool.description,
-            "args": tool.args_schema.schema() if tool.args_schema else {},
+            "args": _get_args_schema(tool),
             "example": self._get_tool_example(tool_name)
         }
     
     def _get_tool_example(self, tool_name: str) -> str:
         """获取工具使用示例"""
-        examples = {
-            "add": "例如：计算 5 + 3 = 8",
-            "multiply": "例如：计算 4 × 7 = 28", 
-            "human_assistance": "例如：需要人工帮助解决复杂问题"
-        }
-        return examples.get(tool_name, "无示例")
+        return self.TOOL_EXAMPLES.get(tool_name, "无示例")
 
 class ToolConfirmationSystem:
     """工具确认系统，用于向用户确认是否执行工具"""
     
-    def __init__(self, llm: BaseManagedModel, tools: Optional[List[BaseTool]]):
-        self.tool_matcher = ToolMatcher(llm, tools)
+    def __init__(self, llm: BaseManagedModel, tools: Optional[List[BaseTool]],
+                 embeddings: Optional[BaseManagedEmbedding] = None, tool_route_threshold: Optional[float] = None):
+        self.tool_matcher = ToolMatcher(llm, tools, embeddings, tool_route_threshold)
     
     def confirm_tool_execution(self, tool_name: str, suggested_args: Dict[str, Any]) -> bool:
         """确认工具执行"""
@@ -1,5 +1,12 @@
 import re
 
+# Code fence at the beginning (```language_name) or at the end (```) of the text,
+# e.g., ```json ```
+_MARKDOWN_FENCE_RE = re.compile(r'^```\w*\s*|\s*```$')
+
+# Characters that matter when matching JSON braces; everything else is skipped by the regex engine
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
 def clean_markdown_format(text):
     """
     Remove markdown code block formatting from the beginning and end of text.
@@ -15,11 +22,52 @@ def clean_markdown_format(text):
 
     text = text.strip()
 
-    # Pattern to match code blocks at the beginning: ```language_name
-    # and at the end: ```
-    # e.g., ```json ```
-    start_pattern = r'^```\w*\s*'
-    end_pattern = r'\s*```$'
-    text = re.sub(start_pattern, '', text)
-    text = re.sub(end_pattern, '', text)
-    return text.strip()
\ No newline at end of file
+    # Most text has no fences at all; skip the regex scan entirely in that case
+    if not text.startswith('```') and not text.endswith('```'):
+        return text
+
+    # Strip both fences in a single pass with the precompiled pattern
+    text = _MARKDOWN_FENCE_RE.sub('', text)
+    return text.strip()
+
+
+def extract_first_json_object(text):
+    """
+    Find the first balanced {...} object in text with a single linear scan.
+
+    Braces inside JSON string literals (including escaped quotes) are ignored.
+
+    Args:
+        text (str): Text that may contain a JSON object, e.g. an LLM response
+
+    Returns:
+        str | None: The substring of the first balanced object, or None if there is none
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            # Character right after a backslash inside a string literal
+            continue
+
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped_pos = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
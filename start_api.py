@@ -20,14 +20,26 @@ def main():
     print("🌐 网页客户端: http://localhost:8000/static/chat.html")
     print("=" * 60)
     
+    # 开发时设置 YOMI_RELOAD=1 开启热重载
+    reload = os.getenv("YOMI_RELOAD") == "1"
+    if reload:
+        server_options = {"reload": True}
+    else:
+        # 工具确认状态（StreamingHandler）和FAISS索引都保存在进程内存中，
+        # 多个worker之间不共享，因此默认单worker，需要时通过 YOMI_WORKERS 显式开启
+        workers = int(os.getenv("YOMI_WORKERS", "1"))
+        print(f"⚙️ 生产模式: {workers} 个worker")
+        # loop/http 为 auto 时，安装了 uvloop/httptools (uvicorn[standard]) 会自动使用
+        server_options = {"workers": workers, "loop": "auto", "http": "auto"}
+    
     try:
         uvicorn.run(
             "src.api.streaming_api:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
             log_level="info",
-            access_log=True
+            access_log=True,
+            **server_options
         )
     except KeyboardInterrupt:
         print("\n🛑 服务器已停止")